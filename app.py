@@ -1,16 +1,24 @@
 # app.py (The Final Polished Version)
 
+import asyncio
+import concurrent.futures
 import gradio as gr
 from pathlib import Path
-import asyncio
 
 # Import backend components
-from app.prediction import PredictionPipeline
-from app.database import add_patient_record, get_all_records
+from app.services import build_inference_services
+from app.executor import ServerBusyError
+from app.database import add_patient_record, get_records_page
+from app import config
 
 # --- Initialization ---
-prediction_pipeline = PredictionPipeline()
+services = build_inference_services()
+prediction_pipeline = services.pipeline
+inference_scheduler = services.scheduler
+analysis_executor = services.executor
+
 SAMPLE_IMAGE_DIR = Path("sample_images")
+MODEL_STATUS_POLL_SECONDS = 2
 try:
     if SAMPLE_IMAGE_DIR.is_dir():
         NORMAL_SAMPLES = [str(p) for p in sorted(list((SAMPLE_IMAGE_DIR / 'NORMAL').glob('*.jpeg')))]
@@ -22,16 +30,50 @@ except FileNotFoundError:
 # --- Core Logic (Async Functions) ---
 async def process_analysis(patient_name, patient_age, image_list):
     """
-    Handles the core logic: validates input, gets prediction, saves to DB, and returns UI updates.
+    Handles the core logic: validates input, streams each image's verdict to the gallery as soon as it
+    is ready, then saves the study-level prediction to the DB and shows it.
     """
     # This function is now only for real analysis, not samples
     if not patient_name or patient_age is None:
         raise gr.Error("Patient Name and Age are required.")
     if not image_list:
         raise gr.Error("At least one image is required.")
-    
-    result = prediction_pipeline.predict(image_list)
+
+    # Display-size thumbnails, keyed by upload index so the gallery keeps the upload order
+    gallery = {}
+    result = None
+    # Decoding and watermarking run off the event loop; the forward passes are shared with other requests
+    try:
+        async for event in analysis_executor.stream(inference_scheduler.predict_stream, image_list, config.DISPLAY_MAX_SIZE or None):
+            if event["type"] == "summary":
+                result = event
+                continue
+            if "image" not in event:
+                # Rejected or undecodable image: nothing to show yet, the uploader stays up
+                yield [gr.update()] * 5
+                continue
+            res = event["result"]
+            gallery[event["index"]] = (event["image"], f"{res['prediction']} | {res['confidence']:.1%}")
+            # Switch to the results view once the first valid image is in
+            yield [
+                gr.update(visible=False), # uploader_column
+                gr.update(visible=True),  # results_column
+                gr.update(value=[gallery[i] for i in sorted(gallery)]), # result_images
+                gr.update(), # result_label
+                gr.update(), # analysis_state
+            ]
+    except ServerBusyError as e:
+        raise gr.Error(str(e))
+
     if "error" in result:
+        # Back to the uploader so the user can pick other files
+        yield [
+            gr.update(visible=True),  # uploader_column
+            gr.update(visible=False), # results_column
+            gr.update(value=None), # result_images
+            gr.update(), # result_label
+            gr.update(), # analysis_state
+        ]
         raise gr.Error(result.get("details", result["error"]))
 
     final_pred = result["final_prediction"]
@@ -46,20 +88,78 @@ async def process_analysis(patient_name, patient_age, image_list):
     confidences["NORMAL" if final_pred == "PNEUMONIA" else "PNEUMONIA"] = 1 - final_conf
     
     # Return a list of updates for the output components
-    return [
+    yield [
         gr.update(visible=False), # uploader_column
         gr.update(visible=True),  # results_column
-        gr.update(value=result["watermarked_images"]), # result_images
-        gr.update(value=confidences) # result_label
+        gr.update(), # result_images (already streamed)
+        gr.update(value=confidences), # result_label
+        # Only file paths and verdicts are kept, full-resolution images are rendered on demand
+        {"sources": list(image_list), "results": result["individual_results"]}, # analysis_state
+    ]
+
+def render_full_resolution(state):
+    """Re-decodes the uploads and watermarks them at full size (only when the user asks for it)."""
+    images = prediction_pipeline.decode_all(state["sources"])
+    return [
+        (prediction_pipeline.render(image, res), f"{res['prediction']} | {res['confidence']:.1%}")
+        for image, res in zip(images, state["results"])
+        if image is not None and res["prediction"] != "Error"
+    ]
+
+async def show_full_resolution(state):
+    if not state:
+        return gr.update()
+    try:
+        return gr.update(value=await analysis_executor.run(render_full_resolution, state))
+    except ServerBusyError as e:
+        raise gr.Error(str(e))
+
+async def model_status():
+    """Readiness banner for the UI: shown while the models load after a (re)start, hidden once they are ready."""
+    while True:
+        try:
+            prediction_pipeline.wait_until_ready(timeout=0)
+        except concurrent.futures.TimeoutError:
+            yield gr.update(value="⏳ Models are still loading. Your first analysis may take a little longer.", visible=True)
+            await asyncio.sleep(MODEL_STATUS_POLL_SECONDS)
+            continue
+        except Exception as e:
+            yield gr.update(value=f"⚠️ The models failed to load, analysis is unavailable. Error: {e}", visible=True)
+            return
+        yield gr.update(value="", visible=False)
+        return
+
+def format_history_rows(records):
+    return [[r.get('name'), r.get('age'), r.get('prediction_result'), f"{r.get('confidence_score', 0):.2%}", r.get('timestamp').strftime('%Y-%m-%d %H:%M')] for r in records]
+
+async def load_history_page(cursors):
+    """
+    Fetches the page whose keyset cursor is last in `cursors` (None = newest page).
+    The list acts as a stack, so "Previous" just pops back to the earlier cursor.
+    """
+    records, next_cursor = await get_records_page(limit=config.HISTORY_PAGE_SIZE, after=cursors[-1])
+    state = {"cursors": cursors, "next": next_cursor}
+    return [
+        gr.update(value=format_history_rows(records)), # history_df
+        state, # history_state
+        gr.update(value=f"Page {len(cursors)}"), # history_page_info
+        gr.update(interactive=len(cursors) > 1), # prev_page_btn
+        gr.update(interactive=next_cursor is not None), # next_page_btn
     ]
 
 async def refresh_history_table():
-    """Fetches records from the DB and formats them for the DataFrame."""
-    records = await get_all_records()
-    data_for_df = []
-    if records:
-        data_for_df = [[r.get('name'), r.get('age'), r.get('prediction_result'), f"{r.get('confidence_score', 0):.2%}", r.get('timestamp').strftime('%Y-%m-%d %H:%M')] for r in records]
-    return gr.update(value=data_for_df)
+    """Fetches the newest page of records from the DB and formats them for the DataFrame."""
+    return await load_history_page([None])
+
+async def next_history_page(state):
+    if not state or state["next"] is None:
+        return await refresh_history_table()
+    return await load_history_page(state["cursors"] + [state["next"]])
+
+async def previous_history_page(state):
+    if not state or len(state["cursors"]) <= 1:
+        return await refresh_history_table()
+    return await load_history_page(state["cursors"][:-1])
 
 # --- Gradio UI Definition ---
 css = """
@@ -84,12 +184,15 @@ with gr.Blocks(theme=gr.themes.Default(primary_hue="blue", secondary_hue="blue")
         with gr.Row(elem_id="main_container"):
             with gr.Column(scale=1) as uploader_column:
                 gr.Markdown("### Upload Patient X-Rays")
+                model_status_md = gr.Markdown(visible=False)
                 image_input = gr.File(label="Upload up to 3 Images", file_count="multiple", file_types=["image"], type="filepath")
             
             with gr.Column(scale=2, visible=False) as results_column:
                 gr.Markdown("### Analysis Results")
                 result_images = gr.Gallery(label="Analyzed Images", columns=3, object_fit="contain", height=350, elem_id="results_gallery")
                 result_label = gr.Label(label="Overall Prediction", num_top_classes=2)
+                full_res_btn = gr.Button("Show Full Resolution", variant="secondary")
+                analysis_state = gr.State()
                 start_over_btn = gr.Button("Start New Analysis", variant="secondary")
 
         with gr.Group(visible=False) as patient_info_modal:
@@ -124,6 +227,11 @@ with gr.Blocks(theme=gr.themes.Default(primary_hue="blue", secondary_hue="blue")
             back_to_main_btn_hist = gr.Button("⬅️ Back to Main App")
             refresh_history_btn = gr.Button("Refresh History")
         history_df = gr.DataFrame(headers=["Name", "Age", "Prediction", "Confidence", "Date"], row_count=10, interactive=False)
+        with gr.Row():
+            prev_page_btn = gr.Button("⬅️ Previous", interactive=False)
+            history_page_info = gr.Markdown("Page 1")
+            next_page_btn = gr.Button("Next ➡️", interactive=False)
+        history_state = gr.State()
 
     # --- SAMPLES PAGE (DEFINITIVE REDESIGN) ---
     with gr.Column(visible=False) as samples_page:
@@ -158,24 +266,30 @@ with gr.Blocks(theme=gr.themes.Default(primary_hue="blue", secondary_hue="blue")
     def show_patient_info(files): return gr.update(visible=True) if files else gr.update(visible=False)
     image_input.upload(fn=show_patient_info, inputs=image_input, outputs=patient_info_modal)
     async def submit_and_hide_modal(name, age, files):
-        analysis_results = await process_analysis(name, age, files); return [*analysis_results, gr.update(visible=False)]
-    submit_analysis_btn.click(fn=submit_and_hide_modal, inputs=[patient_name_modal, patient_age_modal, image_input], outputs=[uploader_column, results_column, result_images, result_label, patient_info_modal])
+        async for analysis_results in process_analysis(name, age, files): yield [*analysis_results, gr.update(visible=False)]
+    submit_analysis_btn.click(fn=submit_and_hide_modal, inputs=[patient_name_modal, patient_age_modal, image_input], outputs=[uploader_column, results_column, result_images, result_label, analysis_state, patient_info_modal])
+    full_res_btn.click(fn=show_full_resolution, inputs=analysis_state, outputs=result_images)
     cancel_btn.click(lambda: (gr.update(visible=False), None), None, [patient_info_modal, image_input])
     start_over_btn.click(fn=None, js="() => { window.location.reload(); }")
     
     all_pages = [main_app, history_page, samples_page]
+    history_outputs = [history_df, history_state, history_page_info, prev_page_btn, next_page_btn]
     async def show_history_page_and_refresh():
-        records_update = await refresh_history_table(); return [gr.update(visible=False), gr.update(visible=True), gr.update(visible=False), records_update]
+        history_updates = await refresh_history_table(); return [gr.update(visible=False), gr.update(visible=True), gr.update(visible=False), *history_updates]
     def show_samples_page(): return [gr.update(visible=False), gr.update(visible=False), gr.update(visible=True)]
     def show_main_page(): return [gr.update(visible=True), gr.update(visible=False), gr.update(visible=False)]
     
-    history_btn.click(fn=show_history_page_and_refresh, outputs=all_pages + [history_df])
+    history_btn.click(fn=show_history_page_and_refresh, outputs=all_pages + history_outputs)
     samples_btn.click(fn=show_samples_page, outputs=all_pages)
     back_to_main_btn_hist.click(fn=show_main_page, outputs=all_pages)
     back_to_main_btn_samp.click(fn=show_main_page, outputs=all_pages)
     
-    refresh_history_btn.click(fn=refresh_history_table, outputs=history_df)
-    demo.load(fn=refresh_history_table, outputs=history_df)
+    refresh_history_btn.click(fn=refresh_history_table, outputs=history_outputs)
+    next_page_btn.click(fn=next_history_page, inputs=history_state, outputs=history_outputs)
+    prev_page_btn.click(fn=previous_history_page, inputs=history_state, outputs=history_outputs)
+    demo.load(fn=refresh_history_table, outputs=history_outputs)
+    # Polls until the models are ready; cheap, so every open page gets its own banner at once
+    demo.load(fn=model_status, outputs=model_status_md, concurrency_limit=None)
 
 # --- Launch the App ---
 if __name__ == "__main__":
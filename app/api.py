@@ -0,0 +1,140 @@
+# app/api.py
+#
+# JSON/multipart inference API for programmatic clients (e.g. PACS integrations). It shares the
+# micro-batcher and bounded analysis pool with the Gradio app but has no UI, database or watermarking.
+# Run with: python -m app.api
+
+import asyncio
+import base64
+import binascii
+import time
+from typing import Any, Dict, List
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+from .executor import ServerBusyError
+from .metrics import Counter, Gauge, Histogram, Registry
+from .services import build_inference_services
+from . import config
+
+services = build_inference_services()
+api = FastAPI(title="Pneumonia Detection API")
+
+# --- Metrics ---
+registry = Registry()
+REQUESTS = registry.register(Counter("api_requests_total", "HTTP requests by endpoint and status code.", ["endpoint", "status"]))
+LATENCY = registry.register(Histogram("api_request_duration_seconds", "End-to-end request latency.", ["endpoint"]))
+IMAGES = registry.register(Counter("api_images_total", "Images scored, by outcome.", ["outcome"]))
+registry.register(Gauge("api_analyses_in_flight", "Analyses running or queued on the bounded pool.", lambda: services.executor.in_flight))
+registry.register(Gauge("api_model_ready", "1 once both models are loaded.", lambda: services.pipeline.is_ready()))
+registry.register(Gauge("api_prediction_cache_hit_rate", "Prediction cache hit rate.", lambda: services.pipeline.cache_stats().get("hit_rate", 0.0)))
+registry.register(Gauge("api_sanity_gate_time_share", "Share of model time spent in the sanity gate.", lambda: services.pipeline.timing_stats()["gate_share"]))
+
+
+class Study(BaseModel):
+    id: str
+    images: List[str]  # base64-encoded image files
+
+
+class BatchRequest(BaseModel):
+    studies: List[Study]
+
+
+def _unavailable(detail: str) -> HTTPException:
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": "5"})
+
+
+def _predict_studies(studies: List[List[bytes]]) -> List[Dict[str, Any]]:
+    """Runs on the analysis pool. Every study is queued before any is awaited, so they share forward passes."""
+    pipeline, scheduler = services.pipeline, services.scheduler
+    decoded = [pipeline.decode_all(images) for images in studies]
+    futures = [scheduler.submit(images) for images in decoded]
+    results = []
+    for future in futures:
+        per_image = future.result()
+        for res in per_image:
+            IMAGES.inc("error" if res["prediction"] == "Error" else "ok")
+        results.append(pipeline.summarize(per_image))
+    return results
+
+
+async def _run_analysis(studies: List[List[bytes]]) -> List[Dict[str, Any]]:
+    if not services.pipeline.is_ready():
+        raise _unavailable("Models are still loading.")
+    try:
+        return await asyncio.wait_for(services.executor.run(_predict_studies, studies), config.API_REQUEST_TIMEOUT_SECONDS)
+    except ServerBusyError as e:
+        raise _unavailable(str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Analysis did not finish within {config.API_REQUEST_TIMEOUT_SECONDS:g}s.")
+
+
+def _check_study_size(count: int):
+    if count == 0:
+        raise HTTPException(status_code=400, detail="No images provided.")
+    if count > config.API_MAX_IMAGES_PER_STUDY:
+        raise HTTPException(status_code=413, detail=f"At most {config.API_MAX_IMAGES_PER_STUDY} images per study.")
+
+
+@api.middleware("http")
+async def record_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Unknown paths are folded into one label so scanners cannot blow up the series count
+    endpoint = request.url.path if request.url.path in {route.path for route in api.routes} else "other"
+    REQUESTS.inc(endpoint, str(response.status_code))
+    LATENCY.observe(time.perf_counter() - start, endpoint)
+    return response
+
+
+@api.post("/v1/predict")
+async def predict(files: List[UploadFile] = File(...)):
+    """One study as multipart uploads; returns the study-level prediction and per-image verdicts."""
+    _check_study_size(len(files))
+    images = [await f.read() for f in files]
+    result = (await _run_analysis([images]))[0]
+    if "error" in result:
+        return JSONResponse(status_code=422, content=result)
+    return result
+
+
+@api.post("/v1/predict/batch")
+async def predict_batch(request: BatchRequest):
+    """Several studies with base64 images in one call; each study gets its own result (or error) by id."""
+    if len(request.studies) > config.API_MAX_STUDIES_PER_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {config.API_MAX_STUDIES_PER_BATCH} studies per batch.")
+    studies = []
+    for study in request.studies:
+        _check_study_size(len(study.images))
+        try:
+            studies.append([base64.b64decode(image, validate=True) for image in study.images])
+        except binascii.Error:
+            raise HTTPException(status_code=400, detail=f"Study '{study.id}' contains an image that is not valid base64.")
+    results = await _run_analysis(studies)
+    return {"results": [{"id": study.id, **result} for study, result in zip(request.studies, results)]}
+
+
+@api.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+
+@api.get("/readyz")
+async def readyz():
+    """Readiness: both models are loaded and the analysis queue has room."""
+    if not services.pipeline.is_ready():
+        return JSONResponse(status_code=503, content={"status": "loading"})
+    if services.executor.in_flight >= services.executor.max_workers + services.executor.max_queue_depth:
+        return JSONResponse(status_code=503, content={"status": "busy"})
+    return {"status": "ready"}
+
+
+@api.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(api, host=config.API_HOST, port=config.API_PORT)
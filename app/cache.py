@@ -0,0 +1,85 @@
+# app/cache.py
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+from PIL import Image
+
+
+def model_revision(model_path: Path) -> str:
+    """
+    Cheap fingerprint of a saved model directory (config contents plus weight file
+    sizes and mtimes), so cached predictions are invalidated when the model is replaced.
+    """
+    model_path = Path(model_path)
+    digest = hashlib.sha256()
+    for name in ("config.json", "model.safetensors", "pytorch_model.bin"):
+        file = model_path / name
+        if not file.exists():
+            continue
+        stat = file.stat()
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        if name == "config.json":
+            digest.update(file.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def image_key(image: Image.Image, revision: str) -> str:
+    """Hashes the decoded pixels (not the file bytes), so re-encoded copies of the same X-ray still hit."""
+    digest = hashlib.sha256()
+    digest.update(revision.encode())
+    digest.update(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL. Bounded by `max_entries`; entries older
+    than `ttl_seconds` are treated as misses and evicted on access.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
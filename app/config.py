@@ -0,0 +1,79 @@
+# app/config.py
+
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# --- Inference Scheduler ---
+# Images from concurrent requests are grouped into one batch until either limit is hit
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "16"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+# Fork this many processes (after the weights are loaded) to run the batches; 0 keeps inference in-process.
+# CPU PyTorch backends only. Threads per worker default to cores // workers. The workers are forked from the
+# loaded models, so startup waits for them even with MODEL_LOAD_IN_BACKGROUND.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+INFERENCE_THREADS_PER_WORKER = int(os.getenv("INFERENCE_THREADS_PER_WORKER", "0"))
+
+# --- Request Admission ---
+# Analyses run on a bounded thread pool; once this many are running and queued, new ones get a "busy" error
+ANALYSIS_MAX_WORKERS = int(os.getenv("ANALYSIS_MAX_WORKERS", "4"))
+ANALYSIS_MAX_QUEUE_DEPTH = int(os.getenv("ANALYSIS_MAX_QUEUE_DEPTH", "8"))
+
+# --- Sanity Gate ---
+# "model" runs an ImageNet classifier to reject obvious non-X-rays, "none" disables the gate entirely
+SANITY_GATE = os.getenv("SANITY_GATE", "model")
+# Any image-classification checkpoint with ImageNet labels can replace the default ResNet-50
+SANITY_GATE_MODEL = os.getenv("SANITY_GATE_MODEL", "microsoft/resnet-50")
+# Accept clearly grayscale, radiograph-like images without running the gate model
+SANITY_GATE_PREFILTER = os.getenv("SANITY_GATE_PREFILTER", "true").lower() in ("1", "true", "yes")
+
+# --- Prediction Cache ---
+# Repeat uploads of the same image skip both models; set the size to 0 to disable caching
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1024"))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "3600"))
+
+# --- Startup ---
+# Load the ViT and the sanity gate model concurrently in the background so the UI binds immediately
+MODEL_LOAD_IN_BACKGROUND = os.getenv("MODEL_LOAD_IN_BACKGROUND", "true").lower() in ("1", "true", "yes")
+
+# --- Classifier Backend ---
+# "fp32" (PyTorch), "int8" (dynamic-quantized PyTorch) or "onnx" (ONNX Runtime); see the model export stage
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "fp32")
+CLASSIFIER_INT8_PATH = os.getenv("CLASSIFIER_INT8_PATH", "artifacts/model_export/model_int8.pt")
+CLASSIFIER_ONNX_PATH = os.getenv("CLASSIFIER_ONNX_PATH", "artifacts/model_export/model.onnx")
+
+# --- Result Display ---
+# Result images are shrunk to fit this many pixels per side before watermarking; 0 sends full resolution
+DISPLAY_MAX_SIZE = int(os.getenv("DISPLAY_MAX_SIZE", "768"))
+
+# --- Patient History ---
+# Rows per page of the history table (pages are fetched with keyset pagination)
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+# The newest records are cached in memory; "off", "local" (single replica), "poll" or "change_stream"
+HISTORY_CACHE_MODE = os.getenv("HISTORY_CACHE_MODE", "poll")
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "500"))
+HISTORY_CACHE_POLL_SECONDS = float(os.getenv("HISTORY_CACHE_POLL_SECONDS", "5"))
+
+# --- Patient Record Writes ---
+# Records are buffered and written with insert_many once this many are pending or the delay has passed
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "50"))
+DB_WRITE_MAX_DELAY_SECONDS = float(os.getenv("DB_WRITE_MAX_DELAY_SECONDS", "1.0"))
+# Set to true to write every record synchronously and wait for the database acknowledgement
+DB_WRITE_DURABLE = os.getenv("DB_WRITE_DURABLE", "false").lower() in ("1", "true", "yes")
+
+# --- Patient Record Storage ---
+# "mongodb" (Motor, needs MONGODB_CONNECTION_STRING), "sqlite" (local file) or "memory" (nothing persisted)
+DB_BACKEND = os.getenv("DB_BACKEND", "mongodb")
+MONGODB_URL = os.getenv("MONGODB_CONNECTION_STRING")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "patient_records.db")
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+
+# --- HTTP Inference API (python -m app.api) ---
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# Requests still waiting on the model after this long get a 504
+API_REQUEST_TIMEOUT_SECONDS = float(os.getenv("API_REQUEST_TIMEOUT_SECONDS", "30"))
+API_MAX_IMAGES_PER_STUDY = int(os.getenv("API_MAX_IMAGES_PER_STUDY", "16"))
+API_MAX_STUDIES_PER_BATCH = int(os.getenv("API_MAX_STUDIES_PER_BATCH", "32"))
@@ -1,41 +1,167 @@
 # app/database.py
 
-import os
-from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
+import asyncio
+import atexit
+import threading
 import datetime
-from typing import List, Dict
-
-# Load environment variables from .env file
-load_dotenv()
+from typing import List, Dict, Optional, Tuple
+from . import config
+from .repositories import PageCursor, PartialWriteError, PatientRepository, create_repository, repository_class
+from .history_cache import HistoryCache
 
 # --- Database Connection ---
-# Get the connection string from the environment variables
-MONGODB_URL = os.getenv("MONGODB_CONNECTION_STRING")
+# The storage backend (MongoDB, SQLite or in-memory) is selected by DB_BACKEND and created on
+# first use rather than at import, so the app can start (and load its models) without waiting on it
+_repository: Optional[PatientRepository] = None
+
+
+def get_repository() -> PatientRepository:
+    """Returns the configured patient record repository, creating it on first call."""
+    global _repository
+    if _repository is None:
+        _repository = create_repository(
+            config.DB_BACKEND, mongodb_url=config.MONGODB_URL,
+            sqlite_path=config.SQLITE_PATH, sqlite_pool_size=config.SQLITE_POOL_SIZE
+        )
+    return _repository
+
 
-if not MONGODB_URL:
-    raise ValueError("MONGODB_CONNECTION_STRING not found in environment variables. Please check your .env file.")
+def set_repository(repository: PatientRepository):
+    """Swaps the storage backend, e.g. for an in-memory store in load tests and benchmarks."""
+    global _repository
+    history_cache.check_repository(type(repository))
+    _repository = repository
+    history_cache.invalidate()
 
-# Create a client instance
-client = AsyncIOMotorClient(MONGODB_URL)
 
-# Get a handle to the database (it will be created if it doesn't exist)
-# The database name 'pneumonia_db' should match the one in your connection string
-database = client.pneumonia_db
+# Newest history records are served from memory; see HistoryCache for how other replicas' writes show up
+history_cache = HistoryCache(
+    get_repository, max_records=config.HISTORY_CACHE_SIZE, mode=config.HISTORY_CACHE_MODE,
+    poll_interval=config.HISTORY_CACHE_POLL_SECONDS,
+    # Other replicas may flush records up to their write-behind delay late
+    poll_lookback=config.DB_WRITE_MAX_DELAY_SECONDS + 10
+)
+# A cache mode the configured backend cannot serve is a configuration error, raised at startup
+history_cache.check_repository(repository_class(config.DB_BACKEND))
 
-# Get a handle to the collection (like a table in SQL)
-patient_collection = database.get_collection("patient_records")
+
+async def ensure_indexes():
+    """Creates the index backing the history sort order (a no-op if it already exists)."""
+    await get_repository().ensure_indexes()
 
 
 # --- Database Operations (now async) ---
 
-async def add_patient_record(name: str, age: int, result: str, confidence: float) -> Dict:
+class WriteBehindBuffer:
+    """
+    Collects documents on the request path and writes them with one `insert_many` once
+    `max_batch` documents are pending or `max_delay` seconds have passed, whichever comes first.
+    A failed flush puts back the documents that were not written and retries them on a timer,
+    backing off exponentially (up to `max_backoff` seconds) while the database keeps failing.
+    """
+
+    def __init__(self, max_batch: int = 50, max_delay: float = 1.0, max_pending: int = 10_000,
+                 max_backoff: float = 60.0):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self._pending: List[Dict] = []
+        self._failures = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    async def add(self, document: Dict):
+        self._loop = asyncio.get_running_loop()
+        with self._lock:
+            self._pending.append(document)
+            if len(self._pending) > self.max_pending:
+                dropped = self._pending.pop(0)
+                print(f"Write-behind buffer full, dropping oldest record for '{dropped.get('name')}'.")
+            pending = len(self._pending)
+        # While backing off, a full batch waits for the retry timer instead of hammering the database
+        if pending >= self.max_batch and not self._failures:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later(self.max_delay))
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        await self.flush()
+
+    def _schedule_retry(self) -> float:
+        delay = min(self.max_delay * 2 ** self._failures, self.max_backoff)
+        self._failures += 1
+        # A timer that is still pending will retry anyway; cancelling it mid-flush could lose its documents
+        if self._timer is None or self._timer.done() or self._timer is asyncio.current_task():
+            self._timer = asyncio.create_task(self._flush_later(delay))
+        return delay
+
+    def _take(self) -> List[Dict]:
+        with self._lock:
+            documents, self._pending = self._pending, []
+        return documents
+
+    def _put_back(self, documents: List[Dict]):
+        with self._lock:
+            self._pending = documents + self._pending
+
+    async def flush(self):
+        documents = self._take()
+        if not documents:
+            return
+        failed: List[Dict] = []
+        try:
+            await get_repository().insert_many(documents)
+        except PartialWriteError as e:
+            # Only the failed documents go back: re-sending inserted ones would fail on duplicate keys forever
+            print(f"Partially wrote patient records. Error: {e}")
+            failed = e.failed
+        except Exception as e:
+            print(f"Failed to write {len(documents)} patient record(s). Error: {e}")
+            failed = documents
+        if not failed:
+            self._failures = 0
+            return
+        self._put_back(failed)
+        delay = self._schedule_retry()
+        print(f"{len(failed)} patient record(s) not written, retrying in {delay:g}s.")
+
+    def flush_on_shutdown(self, timeout: float = 10.0):
+        """
+        Synchronous flush for interpreter shutdown. Uses the app's event loop if it is still
+        running, otherwise falls back to the repository's blocking insert.
+        """
+        if self._loop is not None and self._loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(self.flush(), self._loop).result(timeout)
+                return
+            except Exception as e:
+                print(f"Could not flush patient records on the event loop. Error: {e}")
+
+        documents = self._take()
+        if documents:
+            get_repository().insert_many_sync(documents)
+            print(f"Flushed {len(documents)} buffered patient record(s) on shutdown.")
+
+
+write_buffer = WriteBehindBuffer(max_batch=config.DB_WRITE_BATCH_SIZE, max_delay=config.DB_WRITE_MAX_DELAY_SECONDS)
+atexit.register(write_buffer.flush_on_shutdown)
+
+
+async def add_patient_record(name: str, age: int, result: str, confidence: float, durable: Optional[bool] = None) -> Dict:
     """
-    Inserts a new patient record into the MongoDB collection.
+    Inserts a new patient record into the configured store.
     
-    Returns the inserted document.
+    By default the record goes through the write-behind buffer and is persisted shortly after;
+    pass `durable=True` (or set DB_WRITE_DURABLE) to wait for the database acknowledgement.
+    Returns the constructed document, including its `_id`, without re-reading it.
     """
+    repository = get_repository()
     record_document = {
+        # Assigned client-side so the document is complete before it is written
+        "_id": repository.new_id(),
         "name": name,
         "age": age,
         "prediction_result": result,
@@ -43,21 +169,32 @@ async def add_patient_record(name: str, age: int, result: str, confidence: float
         "timestamp": datetime.datetime.utcnow()
     }
     
-    # .insert_one is an async operation, so we must 'await' it
-    result = await patient_collection.insert_one(record_document)
-    
-    # Find the newly created document to return it
-    new_record = await patient_collection.find_one({"_id": result.inserted_id})
-    return new_record
+    if durable if durable is not None else config.DB_WRITE_DURABLE:
+        await repository.insert_one(record_document)
+    else:
+        await write_buffer.add(record_document)
+    history_cache.append(record_document)
+    return record_document
 
 
 async def get_all_records() -> List[Dict]:
     """
     Retrieves all patient records, sorted by the most recent timestamp.
     """
-    records = []
-    # .find() returns a cursor, which we iterate over asynchronously
-    cursor = patient_collection.find({}).sort("timestamp", -1) # -1 for descending order
-    async for document in cursor:
-        records.append(document)
-    return records
\ No newline at end of file
+    return await get_repository().get_all()
+
+
+async def get_records_page(limit: int = 20, after: Optional[PageCursor] = None) -> Tuple[List[Dict], Optional[PageCursor]]:
+    """
+    Retrieves one page of patient records, newest first, using keyset pagination on
+    (timestamp, _id) so each page costs the same no matter how deep it is.
+
+    Returns the records and the cursor for the next page (None on the last page).
+    """
+    # Fetch one extra document to know whether another page exists
+    records = await history_cache.get_page(limit + 1, after)
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = (records[-1]["timestamp"], records[-1]["_id"])
+    return records, next_cursor
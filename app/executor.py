@@ -0,0 +1,83 @@
+# app/executor.py
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator
+
+
+class ServerBusyError(RuntimeError):
+    """Raised when the analysis queue is full and a new request is refused instead of queued."""
+
+
+class BoundedExecutor:
+    """
+    A thread pool that admits at most `max_workers` running plus `max_queue_depth`
+    waiting tasks. Anything beyond that is rejected immediately with ServerBusyError,
+    so a burst of uploads cannot pile up unbounded latency for everyone else.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue_depth: int = 8):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_depth)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of admitted tasks that are running or waiting for a worker."""
+        return self._in_flight
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise ServerBusyError("The server is busy analysing other studies. Please try again in a moment.")
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Awaitable form of `submit` for use inside async handlers."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    async def stream(self, generator_fn: Callable[..., Iterator[Any]], *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        Runs a blocking generator on the pool (taking a single admission slot for its whole
+        lifetime) and re-yields its items on the event loop as they are produced.
+        """
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def pump():
+            try:
+                for item in generator_fn(*args, **kwargs):
+                    loop.call_soon_threadsafe(items.put_nowait, (item, None))
+            except BaseException as e:
+                loop.call_soon_threadsafe(items.put_nowait, (done, e))
+            else:
+                loop.call_soon_threadsafe(items.put_nowait, (done, None))
+
+        self.submit(pump)
+        while True:
+            item, error = await items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                break
+            yield item
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,138 @@
+# app/history_cache.py
+
+import asyncio
+import datetime
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Type
+from .repositories import ChangeStreamRepository, PageCursor, PatientRepository
+
+CACHE_MODES = ("off", "local", "poll", "change_stream")
+
+
+class HistoryCache:
+    """
+    In-process cache of the newest `max_records` patient records, kept in history order
+    (newest first, ties broken by _id). History pages inside the cached window are served
+    from memory; deeper pages fall through to the repository.
+
+    How the cache learns about records written elsewhere depends on `mode`:
+      - "local": only records added by this process (single-replica deployments).
+      - "poll": at most every `poll_interval` seconds, fetch records newer than the newest cached
+        one minus `poll_lookback` (which covers other replicas' write-behind delay and clock skew).
+      - "change_stream": a background task consumes `repository.watch_inserts()`. Only for a
+        `ChangeStreamRepository`; see `check_repository`.
+    """
+
+    def __init__(self, repository: Callable[[], PatientRepository], max_records: int = 500, mode: str = "poll",
+                 poll_interval: float = 5.0, poll_lookback: float = 10.0):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown history cache mode '{mode}'. Expected one of {CACHE_MODES}.")
+        self._repository = repository
+        self.max_records = max_records
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.poll_lookback = datetime.timedelta(seconds=poll_lookback)
+
+        self._lock = threading.Lock()
+        self._records: List[Dict] = []
+        self._ids = set()
+        self._loaded = False
+        # True while the cache holds every record in the store, so any page can be served from it
+        self._complete = False
+        self._last_poll = 0.0
+        self._watch_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def check_repository(self, repository: Type[PatientRepository]):
+        """Raises ValueError if this cache's mode cannot work with a backend of class `repository`."""
+        if self.mode == "change_stream" and not issubclass(repository, ChangeStreamRepository):
+            raise ValueError(f"HISTORY_CACHE_MODE 'change_stream' needs a storage backend with a change stream, "
+                             f"but '{repository.name}' has none. Use 'poll' instead.")
+
+    @staticmethod
+    def _key(document: Dict) -> Tuple:
+        return (document["timestamp"], str(document["_id"]))
+
+    def _insert(self, documents: List[Dict]):
+        with self._lock:
+            for document in documents:
+                if str(document["_id"]) not in self._ids:
+                    self._ids.add(str(document["_id"]))
+                    self._records.append(dict(document))
+            self._records.sort(key=self._key, reverse=True)
+            if len(self._records) > self.max_records:
+                for evicted in self._records[self.max_records:]:
+                    self._ids.discard(str(evicted["_id"]))
+                del self._records[self.max_records:]
+                self._complete = False
+
+    def append(self, document: Dict):
+        """Adds a record written by this process (before it is even flushed to the store)."""
+        if self._loaded:
+            self._insert([document])
+
+    def invalidate(self):
+        """Drops everything; the next read reloads the newest window from the store."""
+        with self._lock:
+            self._records, self._ids = [], set()
+            self._loaded = self._complete = False
+
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        documents = await self._repository().get_page(self.max_records + 1)
+        self.invalidate()
+        self._insert(documents[:self.max_records])
+        self._complete = len(documents) <= self.max_records
+        self._loaded = True
+        self._last_poll = time.monotonic()
+        if self.mode == "change_stream" and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        try:
+            async for document in self._repository().watch_inserts():
+                self._insert([document])
+        except Exception as e:
+            print(f"History change stream stopped, the cache will reload on next read. Error: {e}")
+            self.invalidate()
+        finally:
+            self._watch_task = None
+
+    async def _poll(self):
+        if self.mode != "poll" or time.monotonic() - self._last_poll < self.poll_interval:
+            return
+        self._last_poll = time.monotonic()
+        with self._lock:
+            newest = self._records[0]["timestamp"] if self._records else None
+        if newest is None:
+            self._loaded = False
+            await self._ensure_loaded()
+            return
+        self._insert(await self._repository().get_newer(newest - self.poll_lookback))
+
+    async def get_page(self, limit: int, after: Optional[PageCursor] = None) -> List[Dict]:
+        """Same contract as `PatientRepository.get_page`, served from memory when the window covers it."""
+        if self.mode == "off":
+            return await self._repository().get_page(limit, after)
+
+        await self._ensure_loaded()
+        await self._poll()
+        with self._lock:
+            if after is None:
+                candidates = self._records
+            else:
+                cutoff = (after[0], str(after[1]))
+                candidates = [r for r in self._records if self._key(r) < cutoff]
+            if len(candidates) >= limit or self._complete:
+                self.hits += 1
+                return [dict(r) for r in candidates[:limit]]
+        self.misses += 1
+        return await self._repository().get_page(limit, after)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"mode": self.mode, "size": len(self._records), "complete": self._complete,
+                    "hits": self.hits, "misses": self.misses}
@@ -3,53 +3,87 @@
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 from pathlib import Path
+from functools import lru_cache
+from typing import Optional, Union
 
-def add_watermark(image_array: np.ndarray, text: str, confidence: float) -> Image.Image:
+
+def make_thumbnail(image: Image.Image, max_size: int) -> Image.Image:
+    """Returns a copy that fits in a max_size x max_size box (aspect ratio kept, never upscaled)."""
+    if max(image.size) <= max_size:
+        return image
+    thumbnail = image.copy()
+    thumbnail.thumbnail((max_size, max_size), Image.LANCZOS)
+    return thumbnail
+
+
+FONT_PATH = Path(__file__).parent / "Roboto-Bold.ttf"
+
+
+@lru_cache(maxsize=128)
+def _load_font(size: int) -> Optional[ImageFont.FreeTypeFont]:
+    """Loads the bundled TTF once per point size; None if the font file is unavailable."""
+    try:
+        return ImageFont.truetype(str(FONT_PATH), size)
+    except IOError:
+        print(f"Font at '{FONT_PATH}' not found, using default.")
+        return None
+
+
+@lru_cache(maxsize=512)
+def _fit_font(text: str, start_size: int, max_width: float):
+    """
+    Largest font size <= `start_size` whose rendered text is narrower than `max_width`.
+    Text width scales linearly with point size, so one measurement gives the answer;
+    the short loop only corrects for hinting/rounding.
+    """
+    font = _load_font(start_size)
+    if font is None:
+        return ImageFont.load_default()
+
+    width = font.getlength(text)
+    size = start_size if width < max_width else max(1, int(start_size * max_width / width))
+    while size > 1 and _load_font(size).getlength(text) >= max_width:
+        size -= 1
+    return _load_font(size)
+
+
+def add_watermark(image: Union[np.ndarray, Image.Image], text: str, confidence: float) -> Image.Image:
     """
     Adds a large, prominent, and consistently sized text banner to the top of an image.
+    Accepts the already-decoded PIL image directly, so no extra array copy is made.
     """
-    image = Image.fromarray(image_array).convert("RGBA")
-    
-    txt_overlay = Image.new("RGBA", image.size, (255, 255, 255, 0))
-    draw = ImageDraw.Draw(txt_overlay)
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    watermarked_image = image.convert("RGB")
 
     is_pneumonia = (text == "PNEUMONIA")
     banner_color = (220, 53, 69, 215) if is_pneumonia else (25, 135, 84, 215)
     text_color = (255, 255, 255)
     
     # --- SIZING FIX: Banner is 1/7th of the image height ---
-    banner_height = int(image.height / 7)
-    
-    # --- FONT FIX: Start large and shrink to fit ---
-    font_path = Path(__file__).parent / "Roboto-Bold.ttf"
-    font_size = int(banner_height * 0.75) # Start with a large font
+    banner_height = max(1, int(watermarked_image.height / 7))
     
+    # --- FONT FIX: Start large, fit within 90% of the image width ---
     text_to_draw = f"{text} | {confidence:.1%}"
-    
-    # Shrink font until the text fits within 90% of the image width
-    while True:
-        try:
-            font = ImageFont.truetype(str(font_path), font_size)
-            text_width = font.getlength(text_to_draw)
-            if text_width < image.width * 0.9:
-                break
-            font_size -= 2
-        except IOError:
-            print(f"Font at '{font_path}' not found, using default.")
-            font = ImageFont.load_default()
-            break # Exit loop if font fails
-            
+    font = _fit_font(text_to_draw, max(1, int(banner_height * 0.75)), watermarked_image.width * 0.9)
+    text_width = font.getlength(text_to_draw)
+
+    # Only the banner strip is blended, the rest of the image is left untouched
+    banner_box = (0, 0, watermarked_image.width, banner_height)
+    banner = watermarked_image.crop(banner_box).convert("RGBA")
+    txt_overlay = Image.new("RGBA", banner.size, (255, 255, 255, 0))
+    draw = ImageDraw.Draw(txt_overlay)
+
     # Draw banner
-    draw.rectangle([0, 0, image.width, banner_height], fill=banner_color)
+    draw.rectangle([0, 0, banner.width, banner_height], fill=banner_color)
 
     # Center the text within the banner
     text_height = font.getbbox(text_to_draw)[3]
-    text_x = (image.width - text_width) / 2
+    text_x = (banner.width - text_width) / 2
     text_y = (banner_height - text_height) / 2
     
     # Draw text
     draw.text((text_x, text_y), text_to_draw, font=font, fill=text_color)
     
-    watermarked_image = Image.alpha_composite(image, txt_overlay)
-    
-    return watermarked_image.convert("RGB")
+    watermarked_image.paste(Image.alpha_composite(banner, txt_overlay).convert("RGB"), banner_box)
+    return watermarked_image
@@ -0,0 +1,30 @@
+# app/loading.py
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+
+def load_in_background(loader: Callable[[], Any], name: str) -> Future:
+    """
+    Runs a (slow) model loader on its own daemon thread and returns a Future for its result.
+    Several loaders started this way download and deserialize concurrently.
+    """
+    future: Future = Future()
+
+    def _run():
+        if not future.set_running_or_notify_cancel():
+            return
+        start = time.perf_counter()
+        try:
+            result = loader()
+        except BaseException as e:
+            print(f"Failed to load {name}. Error: {e}")
+            future.set_exception(e)
+        else:
+            print(f"Loaded {name} in {time.perf_counter() - start:.1f}s.")
+            future.set_result(result)
+
+    threading.Thread(target=_run, name=f"load-{name}", daemon=True).start()
+    return future
@@ -1,115 +1,269 @@
 # app/prediction.py (Final Version with Relaxed Sanity Check)
 
+import io
+import threading
+import time
+from concurrent.futures import Future
 import torch
-from transformers import ViTImageProcessor, ViTForImageClassification, AutoImageProcessor, ResNetForImageClassification
+from transformers import ViTImageProcessor
 from PIL import Image
 from pathlib import Path
 import numpy as np
-from typing import List, Dict, Union, Any
-from .image_utils import add_watermark
+from typing import Callable, List, Dict, Tuple, Union, Any, Optional
+from vitClassifier.components.inference_backend import load_backend
+from vitClassifier.utils.preprocessing import FastImagePreprocessor
+from .image_utils import add_watermark, make_thumbnail
+from .loading import load_in_background
+from .cache import PredictionCache, image_key, model_revision
+from .sanity_gate import SanityGate, build_sanity_gate
 
 ImageType = Union[str, Path, bytes, np.ndarray]
 
-# A list of obviously non-medical terms to check against
-FORBIDDEN_LABELS = [
-    "car", "truck", "van", "motorcycle", "bicycle", "bus", "train", "boat", "airplane",
-    "cat", "dog", "bird", "horse", "sheep", "cow", "bear", "zebra", "giraffe",
-    "landscape", "mountain", "beach", "forest", "building", "house", "road", "street",
-    "computer", "keyboard", "mouse", "laptop", "cellphone", "television",
-    "food", "plate", "bowl", "cup", "fork", "knife", "spoon"
-]
+NOT_A_SCAN_MESSAGE = "Image appears to be a common object, not a medical scan."
 
 class PredictionPipeline:
-    def __init__(self, model_path: Path = Path("artifacts/model_training/model")):
+    def __init__(self, model_path: Path = Path("artifacts/model_training/model"), max_batch_size: int = 16,
+                 sanity_gate: Optional[SanityGate] = None, cache: Optional[PredictionCache] = None,
+                 background: bool = False, backend: str = "fp32",
+                 quantized_model_path: Optional[Path] = None, onnx_model_path: Optional[Path] = None):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        
+        # 'fp32' (PyTorch), 'int8' (dynamic-quantized PyTorch) or 'onnx' (ONNX Runtime) for the ViT
+        self.backend = backend
+        self.quantized_model_path = quantized_model_path
+        self.onnx_model_path = onnx_model_path
+        # Upper bound on how many images go through a model in one forward pass
+        self.max_batch_size = max_batch_size
+
+        # With `background`, the ViT loads on its own thread and only `classify_batch` waits for it
+        self._classifier_future: Optional[Future] = None
+        if background:
+            self._classifier_future = load_in_background(lambda: self._load_classifier(model_path), "pneumonia classifier")
+        else:
+            self._load_classifier(model_path)
+
+        # Out-of-distribution gate; defaults to ResNet-50 behind the cheap grayscale prefilter
+        self.sanity_gate = sanity_gate or build_sanity_gate(device=self.device, max_batch_size=max_batch_size, background=background)
+
+        # Per-image logits and gate verdicts, keyed by pixel hash + model/gate revision
+        self.cache = cache
+        self.cache_revision = f"{model_revision(model_path)}:{backend}:{self.sanity_gate.name}"
+
+        # Cumulative wall-clock time spent in each stage, see `timing_stats`
+        self._timings = {"gate_seconds": 0.0, "classifier_seconds": 0.0, "images": 0}
+        self._timings_lock = threading.Lock()
+
+    def _load_classifier(self, model_path: Path):
         self.pneumonia_processor = ViTImageProcessor.from_pretrained(model_path)
-        self.pneumonia_model = ViTForImageClassification.from_pretrained(model_path).to(self.device)
-        self.pneumonia_model.eval()
+        self.fast_preprocessor = FastImagePreprocessor.from_processor(self.pneumonia_processor)
+        self.pneumonia_model = load_backend(
+            self.backend, model_path, self.quantized_model_path, self.onnx_model_path,
+            device=self.device if self.backend == "fp32" else "cpu"
+        )
         self.id2label = self.pneumonia_model.config.id2label
 
-        self.sanity_processor = AutoImageProcessor.from_pretrained("microsoft/resnet-50")
-        self.sanity_model = ResNetForImageClassification.from_pretrained("microsoft/resnet-50").to(self.device)
-        self.sanity_model.eval()
+    def _require_classifier(self):
+        # Blocks until a background load finishes and re-raises its error if it failed
+        if self._classifier_future is not None:
+            self._classifier_future.result()
+
+    def is_ready(self) -> bool:
+        """True once both the classifier and the sanity gate have finished loading."""
+        classifier_ready = self._classifier_future is None or (
+            self._classifier_future.done() and self._classifier_future.exception() is None
+        )
+        return classifier_ready and self.sanity_gate.is_ready()
+
+    def wait_until_ready(self, timeout: Optional[float] = None):
+        """Blocks until both models are loaded; raises if either failed to load."""
+        if self._classifier_future is not None:
+            self._classifier_future.result(timeout)
+        self.sanity_gate.wait_until_ready(timeout)
+
+    @staticmethod
+    def load_image(source: ImageType) -> Image.Image:
+        """Decodes a single upload (path, bytes or array) into an RGB PIL image."""
+        if isinstance(source, np.ndarray):
+            return Image.fromarray(source).convert("RGB")
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        return Image.open(source).convert("RGB")
+
+    def _chunks(self, items: List[Any]):
+        for start in range(0, len(items), self.max_batch_size):
+            yield items[start:start + self.max_batch_size]
+
+    def sanity_check_batch(self, images: List[Image.Image]) -> List[bool]:
+        """Returns one plausibility flag per image from the configured sanity gate."""
+        return self.sanity_gate.check_batch(images)
 
     def sanity_check(self, image: Image.Image) -> bool:
         """
         Uses a general-purpose model to check if the image is something obviously
         not a medical scan. Returns True if the image is plausible, False otherwise.
         """
-        with torch.no_grad():
-            inputs = self.sanity_processor(images=image, return_tensors="pt").to(self.device)
-            outputs = self.sanity_model(**inputs)
-            logits = outputs.logits
-            
-            top5_indices = torch.topk(logits, 5).indices[0]
-            
-            for idx in top5_indices:
-                label = self.sanity_model.config.id2label[idx.item()].lower()
-                # Check for partial matches (e.g., 'sports car', 'fire truck')
-                for forbidden in FORBIDDEN_LABELS:
-                    if forbidden in label:
-                        print(f"Sanity check FAILED: Image classified as '{label}', which contains a forbidden term '{forbidden}'.")
-                        return False # It's definitely not an X-ray
-        
-        print("Sanity check PASSED: Image does not appear to be a common non-medical object.")
-        return True # It's plausible enough to proceed
-
-    def predict(self, image_sources: List[ImageType]) -> Dict[str, Any]:
-        if not image_sources:
-            return {"error": "No images provided."}
+        return self.sanity_check_batch([image])[0]
 
-        individual_results = []
+    def classify_batch(self, images: List[Image.Image]) -> torch.Tensor:
+        """Runs the ViT over all images in as few forward passes as possible. Returns (N, num_labels) logits."""
+        self._require_classifier()
         all_logits = []
-        valid_images_as_np = []
+        for chunk in self._chunks(images):
+            pixel_values = self.fast_preprocessor(chunk)
+            all_logits.append(self.pneumonia_model(pixel_values))
+        return torch.cat(all_logits, dim=0)
 
-        for source in image_sources:
-            try:
-                if isinstance(source, np.ndarray):
-                    image = Image.fromarray(source).convert("RGB")
-                else:
-                    image = Image.open(source).convert("RGB")
-                
-                # --- NEW: Perform the relaxed sanity check ---
-                if not self.sanity_check(image):
-                    raise ValueError("Image appears to be a common object, not a medical scan.")
-
-                valid_images_as_np.append(np.array(image))
-                
-                # ... (rest of the prediction logic is the same)
-                inputs = self.pneumonia_processor(images=image, return_tensors="pt").to(self.device)
-                with torch.no_grad():
-                    outputs = self.pneumonia_model(**inputs)
-                    logits = outputs.logits
-                    all_logits.append(logits)
-                    ind_probs = torch.nn.functional.softmax(logits, dim=-1); ind_conf, ind_idx = torch.max(ind_probs, dim=-1)
-                    individual_results.append({"prediction": self.id2label[ind_idx.item()], "confidence": ind_conf.item()})
+    def run_models(self, images: List[Image.Image]) -> Tuple[List[Dict[str, Any]], float, float]:
+        """
+        Runs the sanity gate, then the classifier on the plausible images. Returns one
+        {"plausible", "logits"} entry per image plus the seconds spent in the gate and the classifier.
+        Touches neither the cache nor the timing stats, so it can run in a worker process.
+        """
+        gate_start = time.perf_counter()
+        verdicts = self.sanity_check_batch(images)
+        outputs = [{"plausible": plausible, "logits": None} for plausible in verdicts]
+        plausible = [i for i, verdict in enumerate(verdicts) if verdict]
+
+        classifier_start = time.perf_counter()
+        if plausible:
+            logits = self.classify_batch([images[i] for i in plausible]).cpu()
+            for row, i in enumerate(plausible):
+                outputs[i]["logits"] = logits[row]
+        return outputs, classifier_start - gate_start, time.perf_counter() - classifier_start
+
+    def infer(self, images: List[Optional[Image.Image]],
+              run_models: Optional[Callable[[List[Image.Image]], Tuple[List[Dict[str, Any]], float, float]]] = None
+              ) -> List[Dict[str, Any]]:
+        """
+        Runs the sanity gate and the pneumonia classifier over a batch of decoded images.
+
+        `None` entries stand for images that could not be decoded. Returns one entry per
+        input, in order: either {"prediction", "confidence", "logits"} or an error entry.
+        Images already in the prediction cache skip both models; the rest go through
+        `run_models` (by default `self.run_models`, e.g. `InferenceWorkerPool.run_models`).
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+        keys: Dict[int, str] = {}
+        for i, image in enumerate(images):
+            if image is None:
+                results[i] = self._error_result("Image could not be decoded.")
+            elif self.cache is not None:
+                keys[i] = image_key(image, self.cache_revision)
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    results[i] = self._result_from_output(cached)
+
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        outputs, gate_seconds, classifier_seconds = (run_models or self.run_models)([images[i] for i in pending])
+        for i, output in zip(pending, outputs):
+            self._cache_put(keys.get(i), output)
+            results[i] = self._result_from_output(output)
+        self._record_timing(gate_seconds, classifier_seconds, len(images))
+        return results
+
+    def _result_from_logits(self, logits: torch.Tensor) -> Dict[str, Any]:
+        self._require_classifier()
+        probs = torch.nn.functional.softmax(logits, dim=-1)
+        confidence, idx = torch.max(probs, dim=-1)
+        return {"prediction": self.id2label[idx.item()], "confidence": confidence.item(), "logits": logits}
+
+    def _result_from_output(self, output: Dict[str, Any]) -> Dict[str, Any]:
+        # `output` is a {"plausible", "logits"} entry from `run_models` or the cache
+        if not output["plausible"]:
+            return self._error_result(NOT_A_SCAN_MESSAGE)
+        return self._result_from_logits(output["logits"])
+
+    def _cache_put(self, key: Optional[str], value: Dict[str, Any]):
+        if self.cache is not None and key is not None:
+            self.cache.put(key, value)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the prediction cache (empty if caching is disabled)."""
+        return self.cache.stats() if self.cache is not None else {}
+
+    def _record_timing(self, gate_seconds: float, classifier_seconds: float, num_images: int):
+        with self._timings_lock:
+            self._timings["gate_seconds"] += gate_seconds
+            self._timings["classifier_seconds"] += classifier_seconds
+            self._timings["images"] += num_images
+
+    def timing_stats(self) -> Dict[str, float]:
+        """Cumulative time spent in the sanity gate vs. the classifier, and the gate's share of the total."""
+        with self._timings_lock:
+            stats = dict(self._timings)
+        total = stats["gate_seconds"] + stats["classifier_seconds"]
+        stats["gate_share"] = stats["gate_seconds"] / total if total else 0.0
+        return stats
+
+    @staticmethod
+    def _error_result(details: str) -> Dict[str, Any]:
+        print(f"Skipping an invalid image file. Error: {details}")
+        return {"prediction": "Error", "confidence": 0, "details": details}
+
+    def summarize(self, per_image: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Averages the logits of all valid images into the study-level prediction."""
+        self._require_classifier()
+        all_logits = [res["logits"] for res in per_image if res["prediction"] != "Error"]
+        individual_results = [{k: v for k, v in res.items() if k != "logits"} for res in per_image]
 
-            except Exception as e:
-                print(f"Skipping an invalid image file. Error: {e}")
-                individual_results.append({"prediction": "Error", "confidence": 0})
-                continue
-        
         if not all_logits:
              return {"error": "Invalid Image", "details": "All uploaded files were invalid or did not appear to be chest X-rays. Please upload a clear, frontal chest X-ray image."}
 
-        # ... (Aggregate prediction and watermarking are the same)
         avg_logits = torch.mean(torch.stack(all_logits), dim=0)
         probabilities = torch.nn.functional.softmax(avg_logits, dim=-1)
         confidence_score, predicted_class_idx = torch.max(probabilities, dim=-1)
         final_prediction = self.id2label[predicted_class_idx.item()]
         final_confidence = confidence_score.item()
         # NOTE: The low-confidence check has been removed as the sanity check is more robust.
-        
-        watermarked_images = [
-            add_watermark(img_np, res["prediction"], res["confidence"])
-            for img_np, res in zip(valid_images_as_np, individual_results)
-            if res["prediction"] != "Error"
-        ]
-        
+
         return {
             "final_prediction": final_prediction,
             "final_confidence": final_confidence,
             "individual_results": individual_results,
-            "watermarked_images": watermarked_images
         }
+
+    @staticmethod
+    def render(image: Image.Image, result: Dict[str, Any], max_size: Optional[int] = None) -> Image.Image:
+        """
+        Watermarks one image with its verdict. With `max_size`, the image is first shrunk to fit
+        in a max_size x max_size box, which keeps both the watermarking and the upload to the browser cheap.
+        """
+        if max_size:
+            image = make_thumbnail(image, max_size)
+        return add_watermark(image, result["prediction"], result["confidence"])
+
+    def aggregate(self, images: List[Optional[Image.Image]], per_image: List[Dict[str, Any]],
+                  max_size: Optional[int] = None) -> Dict[str, Any]:
+        """Study-level prediction plus each valid image watermarked with its own verdict."""
+        summary = self.summarize(per_image)
+        if "error" in summary:
+            return summary
+
+        summary["watermarked_images"] = [
+            self.render(image, res, max_size)
+            for image, res in zip(images, summary["individual_results"])
+            if res["prediction"] != "Error"
+        ]
+        return summary
+
+    def decode_all(self, image_sources: List[ImageType]) -> List[Optional[Image.Image]]:
+        """Decodes every upload up front; files that fail to open become `None`."""
+        images = []
+        for source in image_sources:
+            try:
+                images.append(self.load_image(source))
+            except Exception as e:
+                print(f"Skipping an invalid image file. Error: {e}")
+                images.append(None)
+        return images
+
+    def predict(self, image_sources: List[ImageType]) -> Dict[str, Any]:
+        if not image_sources:
+            return {"error": "No images provided."}
+
+        # Decode everything first so both models see the whole study in one forward pass each
+        images = self.decode_all(image_sources)
+        per_image = self.infer(images)
+        return self.aggregate(images, per_image)
@@ -0,0 +1,329 @@
+# app/repositories.py
+
+import asyncio
+import datetime
+import queue
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+
+# A keyset cursor: (timestamp, _id) of the last record on the previous page
+PageCursor = Tuple[datetime.datetime, Any]
+
+# Only the fields the history table shows are returned by `get_page`
+HISTORY_FIELDS = ("_id", "name", "age", "prediction_result", "confidence_score", "timestamp")
+
+# MongoDB's duplicate key error: with client-assigned ids, the document is already stored
+DUPLICATE_KEY_ERROR = 11000
+
+
+class PartialWriteError(Exception):
+    """Some documents of a batch insert were not written; `failed` are the ones worth retrying."""
+
+    def __init__(self, failed: List[Dict], message: str):
+        super().__init__(message)
+        self.failed = failed
+
+
+class PatientRepository(ABC):
+    """
+    Storage interface behind `app.database`. Records are plain dicts with the keys in
+    HISTORY_FIELDS; `get_page` returns them newest first, paginated by (timestamp, _id).
+    A backend missing any abstract method fails when it is instantiated.
+    """
+    name = "base"
+
+    def new_id(self) -> Any:
+        return uuid.uuid4().hex
+
+    async def ensure_indexes(self):
+        pass
+
+    async def insert_one(self, document: Dict):
+        await self.insert_many([document])
+
+    @abstractmethod
+    async def insert_many(self, documents: List[Dict]):
+        """Inserts all documents; raises PartialWriteError when only some of them were written."""
+
+    @abstractmethod
+    def insert_many_sync(self, documents: List[Dict]):
+        """Blocking insert used at interpreter shutdown, when no event loop may be left."""
+
+    @abstractmethod
+    async def get_page(self, limit: int, after: Optional[PageCursor] = None) -> List[Dict]:
+        """Up to `limit` records strictly older than `after` in (timestamp, _id) order, newest first."""
+
+    @abstractmethod
+    async def get_all(self) -> List[Dict]:
+        """Every record, newest first."""
+
+    @abstractmethod
+    async def get_newer(self, since: datetime.datetime) -> List[Dict]:
+        """Records with a timestamp >= `since`, newest first (used to refresh the history cache)."""
+
+
+
+class ChangeStreamRepository(PatientRepository):
+    """A backend that can push inserts to the history cache instead of being polled for them."""
+
+    @abstractmethod
+    def watch_inserts(self) -> AsyncIterator[Dict]:
+        """Yields records inserted from now on, by any process."""
+
+
+class MotorPatientRepository(ChangeStreamRepository):
+    """MongoDB via Motor. The client is created on first use."""
+    name = "mongodb"
+
+    # Newest first; `_id` breaks ties between records with the same timestamp
+    SORT = [("timestamp", -1), ("_id", -1)]
+    PROJECTION = {field: 1 for field in HISTORY_FIELDS}
+
+    def __init__(self, url: str, database: str = "pneumonia_db", collection: str = "patient_records"):
+        if not url:
+            raise ValueError("MONGODB_CONNECTION_STRING not found in environment variables. Please check your .env file.")
+        self.url = url
+        self.database_name = database
+        self.collection_name = collection
+        self._collection = None
+        self._indexes_created = False
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            # The database (and collection) are created on first write if they don't exist
+            self._collection = AsyncIOMotorClient(self.url)[self.database_name].get_collection(self.collection_name)
+        return self._collection
+
+    def new_id(self) -> Any:
+        from bson import ObjectId
+        return ObjectId()
+
+    async def ensure_indexes(self):
+        if not self._indexes_created:
+            await self.collection.create_index(self.SORT, name="timestamp_id_desc")
+            self._indexes_created = True
+
+    async def insert_one(self, document: Dict):
+        await self.collection.insert_one(document)
+
+    @staticmethod
+    def _partial_write_error(documents: List[Dict], error) -> PartialWriteError:
+        # With ordered=False every document without a write error was inserted
+        write_errors = error.details.get("writeErrors", [])
+        failed = [documents[e["index"]] for e in write_errors if e.get("code") != DUPLICATE_KEY_ERROR]
+        return PartialWriteError(failed, f"{len(write_errors)} of {len(documents)} document(s) not inserted "
+                                         f"({len(failed)} retryable): {error}")
+
+    async def insert_many(self, documents: List[Dict]):
+        from pymongo.errors import BulkWriteError
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            raise self._partial_write_error(documents, e) from e
+
+    def insert_many_sync(self, documents: List[Dict]):
+        from pymongo import MongoClient
+        from pymongo.errors import BulkWriteError
+        with MongoClient(self.url, serverSelectionTimeoutMS=10_000) as client:
+            try:
+                client[self.database_name].get_collection(self.collection_name).insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                raise self._partial_write_error(documents, e) from e
+
+    async def get_page(self, limit: int, after: Optional[PageCursor] = None) -> List[Dict]:
+        await self.ensure_indexes()
+        query = {}
+        if after is not None:
+            timestamp, last_id = after
+            query = {"$or": [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": last_id}},
+            ]}
+        cursor = self.collection.find(query, self.PROJECTION).sort(self.SORT).limit(limit)
+        return [document async for document in cursor]
+
+    async def get_all(self) -> List[Dict]:
+        cursor = self.collection.find({}).sort(self.SORT)
+        return [document async for document in cursor]
+
+    async def get_newer(self, since: datetime.datetime) -> List[Dict]:
+        cursor = self.collection.find({"timestamp": {"$gte": since}}, self.PROJECTION).sort(self.SORT)
+        return [document async for document in cursor]
+
+    async def watch_inserts(self) -> AsyncIterator[Dict]:
+        # Change streams need a replica set (which MongoDB Atlas always is)
+        async with self.collection.watch([{"$match": {"operationType": "insert"}}]) as stream:
+            async for change in stream:
+                yield change["fullDocument"]
+
+
+class SQLitePatientRepository(PatientRepository):
+    """
+    Local SQLite file in WAL mode (readers never block the writer) with a small pool of
+    connections. Queries run on worker threads so the event loop is never blocked.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str = "patient_records.db", pool_size: int = 4):
+        self.path = path
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS patient_records ("
+                " id TEXT PRIMARY KEY, name TEXT, age INTEGER, prediction_result TEXT,"
+                " confidence_score REAL, timestamp TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_patient_records_timestamp_id ON patient_records (timestamp DESC, id DESC)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @staticmethod
+    def _to_row(document: Dict) -> Tuple:
+        # ISO-8601 strings sort lexicographically in time order
+        return (str(document["_id"]), document["name"], document["age"], document["prediction_result"],
+                document["confidence_score"], document["timestamp"].isoformat())
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict:
+        return {
+            "_id": row["id"], "name": row["name"], "age": row["age"],
+            "prediction_result": row["prediction_result"], "confidence_score": row["confidence_score"],
+            "timestamp": datetime.datetime.fromisoformat(row["timestamp"]),
+        }
+
+    def insert_many_sync(self, documents: List[Dict]):
+        with self._connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("INSERT OR IGNORE INTO patient_records VALUES (?, ?, ?, ?, ?, ?)",
+                                 [self._to_row(document) for document in documents])
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    async def insert_many(self, documents: List[Dict]):
+        await asyncio.to_thread(self.insert_many_sync, documents)
+
+    def _select(self, sql: str, params: Tuple = ()) -> List[Dict]:
+        with self._connection() as conn:
+            return [self._from_row(row) for row in conn.execute(sql, params).fetchall()]
+
+    async def get_page(self, limit: int, after: Optional[PageCursor] = None) -> List[Dict]:
+        if after is None:
+            sql, params = "SELECT * FROM patient_records ORDER BY timestamp DESC, id DESC LIMIT ?", (limit,)
+        else:
+            timestamp, last_id = after
+            sql = ("SELECT * FROM patient_records WHERE (timestamp, id) < (?, ?) "
+                   "ORDER BY timestamp DESC, id DESC LIMIT ?")
+            params = (timestamp.isoformat(), str(last_id), limit)
+        return await asyncio.to_thread(self._select, sql, params)
+
+    async def get_all(self) -> List[Dict]:
+        return await asyncio.to_thread(self._select, "SELECT * FROM patient_records ORDER BY timestamp DESC, id DESC")
+
+    async def get_newer(self, since: datetime.datetime) -> List[Dict]:
+        return await asyncio.to_thread(
+            self._select, "SELECT * FROM patient_records WHERE timestamp >= ? ORDER BY timestamp DESC, id DESC",
+            (since.isoformat(),)
+        )
+
+
+class InMemoryPatientRepository(ChangeStreamRepository):
+    """Process-local list, for tests, load tests and benchmarks. Nothing survives a restart."""
+    name = "memory"
+
+    def __init__(self):
+        self._records: List[Dict] = []
+        self._lock = threading.Lock()
+        # (event loop, queue) per active `watch_inserts` consumer; a local stand-in for a change stream
+        self._watchers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+
+    @staticmethod
+    def _key(document: Dict) -> Tuple:
+        return (document["timestamp"], str(document["_id"]))
+
+    def insert_many_sync(self, documents: List[Dict]):
+        with self._lock:
+            self._records.extend(dict(document) for document in documents)
+            self._records.sort(key=self._key, reverse=True)
+            watchers = list(self._watchers)
+        for loop, changes in watchers:
+            for document in documents:
+                loop.call_soon_threadsafe(changes.put_nowait, dict(document))
+
+    async def insert_many(self, documents: List[Dict]):
+        self.insert_many_sync(documents)
+
+    async def get_page(self, limit: int, after: Optional[PageCursor] = None) -> List[Dict]:
+        with self._lock:
+            records = self._records
+            if after is not None:
+                cutoff = (after[0], str(after[1]))
+                records = [r for r in records if self._key(r) < cutoff]
+            return [dict(r) for r in records[:limit]]
+
+    async def get_all(self) -> List[Dict]:
+        with self._lock:
+            return [dict(r) for r in self._records]
+
+    async def get_newer(self, since: datetime.datetime) -> List[Dict]:
+        with self._lock:
+            return [dict(r) for r in self._records if r["timestamp"] >= since]
+
+    async def watch_inserts(self) -> AsyncIterator[Dict]:
+        watcher = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._watchers.append(watcher)
+        try:
+            while True:
+                yield await watcher[1].get()
+        finally:
+            with self._lock:
+                self._watchers.remove(watcher)
+
+
+REPOSITORY_BACKENDS: Dict[str, Type[PatientRepository]] = {
+    repository.name: repository
+    for repository in (MotorPatientRepository, SQLitePatientRepository, InMemoryPatientRepository)
+}
+
+
+def repository_class(backend: str) -> Type[PatientRepository]:
+    """The repository class for a DB_BACKEND value, so its capabilities can be checked without connecting."""
+    try:
+        return REPOSITORY_BACKENDS[backend.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown DB_BACKEND '{backend}'. Expected 'mongodb', 'sqlite' or 'memory'.") from None
+
+
+def create_repository(backend: str, mongodb_url: Optional[str] = None, sqlite_path: str = "patient_records.db",
+                      sqlite_pool_size: int = 4) -> PatientRepository:
+    """Builds the storage backend selected in config: 'mongodb', 'sqlite' or 'memory'."""
+    repository = repository_class(backend)
+    if repository is MotorPatientRepository:
+        return MotorPatientRepository(mongodb_url)
+    if repository is SQLitePatientRepository:
+        return SQLitePatientRepository(sqlite_path, pool_size=sqlite_pool_size)
+    return InMemoryPatientRepository()
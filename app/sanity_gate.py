@@ -0,0 +1,193 @@
+# app/sanity_gate.py
+
+import torch
+import numpy as np
+from PIL import Image
+from transformers import AutoImageProcessor, AutoModelForImageClassification
+from abc import ABC, abstractmethod
+from typing import List, Dict, FrozenSet, Iterable, Optional, Callable
+from .loading import load_in_background
+
+# A list of obviously non-medical terms to check against
+FORBIDDEN_LABELS = [
+    "car", "truck", "van", "motorcycle", "bicycle", "bus", "train", "boat", "airplane",
+    "cat", "dog", "bird", "horse", "sheep", "cow", "bear", "zebra", "giraffe",
+    "landscape", "mountain", "beach", "forest", "building", "house", "road", "street",
+    "computer", "keyboard", "mouse", "laptop", "cellphone", "television",
+    "food", "plate", "bowl", "cup", "fork", "knife", "spoon"
+]
+
+
+def forbidden_class_indices(id2label: Dict[int, str], forbidden_terms: Iterable[str] = FORBIDDEN_LABELS) -> FrozenSet[int]:
+    """
+    Resolves forbidden terms to class indices once, using the same partial matching
+    as before (e.g. 'sports car' and 'fire truck' are caught by 'car' and 'truck').
+    """
+    terms = [term.lower() for term in forbidden_terms]
+    return frozenset(
+        int(idx) for idx, label in id2label.items()
+        if any(term in label.lower() for term in terms)
+    )
+
+
+class SanityGate(ABC):
+    """Decides, per image, whether it is plausible enough to send to the pneumonia classifier."""
+    name = "base"
+
+    @abstractmethod
+    def check_batch(self, images: List[Image.Image]) -> List[bool]:
+        """One plausibility flag per image, in order."""
+
+    def is_ready(self) -> bool:
+        """False while the gate's model is still loading in the background."""
+        return True
+
+    def wait_until_ready(self, timeout: Optional[float] = None):
+        pass
+
+
+class NullGate(SanityGate):
+    """Lets every image through. Used when the gate is disabled in config."""
+    name = "none"
+
+    def check_batch(self, images: List[Image.Image]) -> List[bool]:
+        return [True] * len(images)
+
+
+class ModelGate(SanityGate):
+    """
+    Rejects an image if any of a general-purpose ImageNet classifier's top-k labels is a
+    forbidden (obviously non-medical) class. Defaults to `microsoft/resnet-50`, but any
+    `AutoModelForImageClassification` checkpoint with ImageNet labels can be swapped in.
+    """
+    name = "model"
+
+    def __init__(self, model_name: str = "microsoft/resnet-50", device: str = "cpu", top_k: int = 5, max_batch_size: int = 16):
+        self.model_name = model_name
+        self.device = device
+        self.top_k = top_k
+        self.max_batch_size = max_batch_size
+
+        self.processor = AutoImageProcessor.from_pretrained(model_name)
+        self.model = AutoModelForImageClassification.from_pretrained(model_name).to(device)
+        self.model.eval()
+
+        self.forbidden_ids = forbidden_class_indices(self.model.config.id2label)
+        self._forbidden_tensor = torch.tensor(sorted(self.forbidden_ids), dtype=torch.long, device=device)
+
+    def check_batch(self, images: List[Image.Image]) -> List[bool]:
+        verdicts = []
+        for start in range(0, len(images), self.max_batch_size):
+            chunk = images[start:start + self.max_batch_size]
+            with torch.no_grad():
+                inputs = self.processor(images=chunk, return_tensors="pt").to(self.device)
+                logits = self.model(**inputs).logits
+                top_indices = torch.topk(logits, self.top_k).indices
+                rejected = torch.isin(top_indices, self._forbidden_tensor)
+
+            for row, hits in zip(top_indices.tolist(), rejected.tolist()):
+                if any(hits):
+                    label = self.model.config.id2label[row[hits.index(True)]].lower()
+                    print(f"Sanity check FAILED: Image classified as '{label}', which is a forbidden class.")
+                    verdicts.append(False) # It's definitely not an X-ray
+                else:
+                    verdicts.append(True) # It's plausible enough to proceed
+        return verdicts
+
+
+class HeuristicPrefilter:
+    """
+    Cheap pixel statistics that recognise obvious radiographs: essentially no colour,
+    real contrast, and a sizeable dark background. It only ever *accepts* images; anything
+    it is unsure about still goes through the wrapped gate.
+    """
+
+    def __init__(self, max_channel_spread: float = 3.0, min_contrast: float = 40.0,
+                 min_dark_fraction: float = 0.05, max_dark_fraction: float = 0.7, sample_size: int = 64):
+        self.max_channel_spread = max_channel_spread
+        self.min_contrast = min_contrast
+        self.min_dark_fraction = min_dark_fraction
+        self.max_dark_fraction = max_dark_fraction
+        self.sample_size = sample_size
+
+    def looks_like_xray(self, image: Image.Image) -> bool:
+        thumb = np.asarray(image.convert("RGB").resize((self.sample_size, self.sample_size), Image.BILINEAR), dtype=np.float32)
+        gray = thumb.mean(axis=-1)
+
+        # Colour photos have channels that disagree; X-rays are grayscale stored as RGB
+        channel_spread = np.abs(thumb - gray[..., None]).mean()
+        if channel_spread > self.max_channel_spread:
+            return False
+        if gray.std() < self.min_contrast:
+            return False
+        dark_fraction = (gray < 40).mean()
+        return self.min_dark_fraction <= dark_fraction <= self.max_dark_fraction
+
+
+class BackgroundLoadedGate(SanityGate):
+    """
+    Builds the wrapped gate on a background thread. Only callers that actually need
+    the gate model block on it, so startup is not held up by the download.
+    """
+
+    def __init__(self, factory: Callable[[], SanityGate], name: str):
+        self.name = name
+        self._future = load_in_background(factory, f"sanity gate '{name}'")
+
+    @property
+    def gate(self) -> SanityGate:
+        return self._future.result()
+
+    def check_batch(self, images: List[Image.Image]) -> List[bool]:
+        return self.gate.check_batch(images)
+
+    def is_ready(self) -> bool:
+        return self._future.done() and self._future.exception() is None
+
+    def wait_until_ready(self, timeout: Optional[float] = None):
+        self._future.result(timeout)
+
+
+class PrefilteredGate(SanityGate):
+    """Runs the heuristic first and only sends images it cannot vouch for to the wrapped gate."""
+
+    def __init__(self, inner: SanityGate, prefilter: Optional[HeuristicPrefilter] = None):
+        self.inner = inner
+        self.prefilter = prefilter or HeuristicPrefilter()
+        self.name = f"prefilter+{inner.name}"
+
+    def check_batch(self, images: List[Image.Image]) -> List[bool]:
+        verdicts = [self.prefilter.looks_like_xray(image) for image in images]
+        undecided = [i for i, ok in enumerate(verdicts) if not ok]
+        if undecided:
+            for i, ok in zip(undecided, self.inner.check_batch([images[i] for i in undecided])):
+                verdicts[i] = ok
+        return verdicts
+
+    def is_ready(self) -> bool:
+        return self.inner.is_ready()
+
+    def wait_until_ready(self, timeout: Optional[float] = None):
+        self.inner.wait_until_ready(timeout)
+
+
+def build_sanity_gate(mode: str = "model", model_name: str = "microsoft/resnet-50", prefilter: bool = True,
+                      device: str = "cpu", max_batch_size: int = 16, background: bool = False) -> SanityGate:
+    """
+    Creates the gate selected in config: 'model' (optionally behind the heuristic prefilter) or 'none'.
+    With `background`, the gate model loads on its own thread and images accepted by the
+    prefilter never wait for it.
+    """
+    mode = mode.lower()
+    if mode == "none":
+        return NullGate()
+    if mode != "model":
+        raise ValueError(f"Unknown sanity gate mode '{mode}'. Expected 'model' or 'none'.")
+
+    def factory() -> SanityGate:
+        return ModelGate(model_name, device=device, max_batch_size=max_batch_size)
+
+    gate = BackgroundLoadedGate(factory, name=ModelGate.name) if background else factory()
+    if prefilter:
+        gate = PrefilteredGate(gate)
+    return gate
@@ -0,0 +1,164 @@
+# app/scheduler.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Dict, Any, Callable, Iterator, Optional
+from PIL import Image
+
+from .prediction import PredictionPipeline, ImageType
+
+_STOP = object()
+
+@dataclass
+class _Job:
+    images: List[Optional[Image.Image]]
+    future: Future
+
+
+class MicroBatchScheduler:
+    """
+    Collects decoded images from concurrent requests into shared batches and runs
+    them through `PredictionPipeline.infer`.
+
+    A batch is dispatched as soon as it holds `max_batch_size` images or the oldest
+    queued request has waited `max_wait_ms`, whichever comes first. Each request gets
+    back a Future resolving to its own slice of the per-image results. Batches can be
+    handed to another `infer` implementation, e.g. `InferenceWorkerPool.infer`.
+
+    With `max_in_flight` > 1, up to that many batches run at once (e.g. one per pool worker)
+    instead of one after another. Once all slots are busy, new requests keep queueing and are
+    coalesced into the next batch when a slot frees up.
+    """
+
+    def __init__(self, pipeline: PredictionPipeline, max_batch_size: int = 16, max_wait_ms: float = 10,
+                 infer: Optional[Callable[[List[Optional[Image.Image]]], List[Dict[str, Any]]]] = None,
+                 max_in_flight: int = 1):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1.")
+        self.pipeline = pipeline
+        self.infer = infer or pipeline.infer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_in_flight = max_in_flight
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._slots = threading.Semaphore(max_in_flight)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> "MicroBatchScheduler":
+        if self._thread is None or not self._thread.is_alive():
+            if self.max_in_flight > 1:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="inference-batch")
+            self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Lets already-queued requests finish, then stops the worker thread(s)."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def submit(self, images: List[Optional[Image.Image]]) -> Future:
+        """Queues decoded images (`None` = undecodable) and returns a Future of per-image results."""
+        future: Future = Future()
+        if not images:
+            future.set_result([])
+            return future
+        self._queue.put(_Job(images, future))
+        return future
+
+    def predict(self, image_sources: List[ImageType]) -> Dict[str, Any]:
+        """Drop-in, blocking replacement for `PredictionPipeline.predict` that goes through the batcher."""
+        if not image_sources:
+            return {"error": "No images provided."}
+
+        images = self.pipeline.decode_all(image_sources)
+        per_image = self.submit(images).result()
+        return self.pipeline.aggregate(images, per_image)
+
+    def predict_stream(self, image_sources: List[ImageType], display_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Blocking generator that yields {"type": "image", "index", "result", "image"} as soon as each
+        image's verdict is ready (in completion order), then one {"type": "summary", ...} event with the
+        study-level prediction. Rendered images are shrunk to `display_size` when given.
+        """
+        images = self.pipeline.decode_all(image_sources)
+        # One job per image: they still share forward passes, but each resolves on its own
+        futures = {self.submit([image]): i for i, image in enumerate(images)}
+        per_image: List[Optional[Dict[str, Any]]] = [None] * len(images)
+
+        for future in as_completed(futures):
+            i = futures[future]
+            per_image[i] = future.result()[0]
+            event = {"type": "image", "index": i, "result": {k: v for k, v in per_image[i].items() if k != "logits"}}
+            if per_image[i]["prediction"] != "Error":
+                event["image"] = self.pipeline.render(images[i], per_image[i], display_size)
+            yield event
+
+        yield {"type": "summary", **self.pipeline.summarize(per_image)}
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            # Wait for a free slot before taking a job, so requests arriving meanwhile join its batch
+            self._slots.acquire()
+            job = self._queue.get()
+            if job is _STOP:
+                self._slots.release()
+                break
+
+            batch = [job]
+            size = len(job.images)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stopping = True
+                    break
+                batch.append(job)
+                size += len(job.images)
+
+            if self._executor is not None:
+                self._executor.submit(self._run_batch_in_slot, batch)
+            else:
+                self._run_batch_in_slot(batch)
+
+    def _run_batch_in_slot(self, batch: List[_Job]):
+        try:
+            self._run_batch(batch)
+        finally:
+            self._slots.release()
+
+    def _run_batch(self, batch: List[_Job]):
+        # Requests cancelled while waiting in the queue are dropped from the batch
+        batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        images = [image for job in batch for image in job.images]
+        try:
+            results = self.infer(images)
+        except Exception as e:
+            print(f"Batched inference failed for {len(batch)} request(s). Error: {e}")
+            for job in batch:
+                job.future.set_exception(e)
+            return
+
+        offset = 0
+        for job in batch:
+            job.future.set_result(results[offset:offset + len(job.images)])
+            offset += len(job.images)
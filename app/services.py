@@ -0,0 +1,57 @@
+# app/services.py
+
+import torch
+from dataclasses import dataclass
+from typing import Optional
+from pathlib import Path
+from .prediction import PredictionPipeline
+from .sanity_gate import build_sanity_gate
+from .cache import PredictionCache
+from .scheduler import MicroBatchScheduler
+from .executor import BoundedExecutor
+from .worker_pool import InferenceWorkerPool
+from . import config
+
+
+@dataclass
+class InferenceServices:
+    """Everything a front end (the Gradio UI or the HTTP API) needs to serve predictions."""
+    pipeline: PredictionPipeline
+    scheduler: MicroBatchScheduler
+    executor: BoundedExecutor
+    worker_pool: Optional[InferenceWorkerPool] = None
+
+
+def build_inference_services() -> InferenceServices:
+    """Builds the models, cache, micro-batcher and bounded analysis pool from `app.config`."""
+    sanity_gate = build_sanity_gate(
+        mode=config.SANITY_GATE, model_name=config.SANITY_GATE_MODEL, prefilter=config.SANITY_GATE_PREFILTER,
+        device="cuda" if torch.cuda.is_available() else "cpu", max_batch_size=config.INFERENCE_MAX_BATCH_SIZE,
+        background=config.MODEL_LOAD_IN_BACKGROUND
+    )
+    prediction_cache = (
+        PredictionCache(max_entries=config.PREDICTION_CACHE_SIZE, ttl_seconds=config.PREDICTION_CACHE_TTL_SECONDS)
+        if config.PREDICTION_CACHE_SIZE > 0 else None
+    )
+    pipeline = PredictionPipeline(
+        max_batch_size=config.INFERENCE_MAX_BATCH_SIZE, sanity_gate=sanity_gate, cache=prediction_cache,
+        background=config.MODEL_LOAD_IN_BACKGROUND, backend=config.CLASSIFIER_BACKEND,
+        quantized_model_path=Path(config.CLASSIFIER_INT8_PATH), onnx_model_path=Path(config.CLASSIFIER_ONNX_PATH)
+    )
+    # Forked before any other thread runs inference. The workers need the loaded weights, so this blocks
+    # until a background load finishes: with INFERENCE_WORKERS > 0, MODEL_LOAD_IN_BACKGROUND only
+    # overlaps the two model loads and no longer lets the UI bind before they are done
+    worker_pool = (
+        InferenceWorkerPool(pipeline, config.INFERENCE_WORKERS, config.INFERENCE_THREADS_PER_WORKER or None).start()
+        if config.INFERENCE_WORKERS > 0 else None
+    )
+    # Images from concurrent analyses are batched together on a dedicated worker thread
+    scheduler = MicroBatchScheduler(
+        pipeline, max_batch_size=config.INFERENCE_MAX_BATCH_SIZE, max_wait_ms=config.INFERENCE_MAX_WAIT_MS,
+        infer=worker_pool.infer if worker_pool is not None else None,
+        # One batch per worker in flight, so the pool is not idle while a batch is being collected
+        max_in_flight=worker_pool.num_workers if worker_pool is not None else 1
+    ).start()
+    # Bounded pool for the CPU-heavy parts of an analysis (decoding, waiting on the batch, watermarking)
+    executor = BoundedExecutor(max_workers=config.ANALYSIS_MAX_WORKERS, max_queue_depth=config.ANALYSIS_MAX_QUEUE_DEPTH)
+    return InferenceServices(pipeline=pipeline, scheduler=scheduler, executor=executor, worker_pool=worker_pool)
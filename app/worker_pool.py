@@ -0,0 +1,218 @@
+# app/worker_pool.py
+
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import torch
+from PIL import Image
+
+from .prediction import PredictionPipeline
+
+_STOP = None
+
+
+def _worker_main(pipeline: PredictionPipeline, num_threads: int, index: int, tasks, results):
+    # Each worker gets its own slice of the cores, so N workers x intra-op threads never oversubscribe the CPU
+    torch.set_num_threads(num_threads)
+    while True:
+        task = tasks.get()
+        if task is _STOP:
+            break
+        task_id, images = task
+        try:
+            results.put((index, task_id, pipeline.run_models(images), None))
+        except Exception as e:
+            # Exceptions from the models may not pickle; the message is enough for the caller
+            results.put((index, task_id, None, f"{type(e).__name__}: {e}"))
+
+
+class InferenceWorkerPool:
+    """
+    Runs `PredictionPipeline.run_models` in `num_workers` forked processes, so pre/post-processing
+    and the forward passes of different chunks are not serialized by one GIL.
+
+    The weights are loaded once in the parent and inherited through fork: inference never writes
+    to parameter storage, so those pages stay copy-on-write shared instead of being duplicated per
+    worker. Call `start()` before any other thread runs inference (forking mid-forward is unsafe);
+    it waits for a background model load to finish. The prediction cache and timing stats stay in
+    the parent: `infer` looks up the cache first and only sends misses to the workers, which return
+    their model timings with each result.
+
+    Each task goes to one idle worker, so the pool knows which task a worker holds. A worker that
+    dies fails only that task and is not replaced: by then the server is multi-threaded and forking
+    again could deadlock the child on inherited locks. The remaining workers carry on; once all of
+    them are gone, `run_models` falls back to running the models in this process.
+    """
+
+    def __init__(self, pipeline: PredictionPipeline, num_workers: int, threads_per_worker: Optional[int] = None):
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1.")
+        if pipeline.device == "cuda" or pipeline.backend == "onnx":
+            # CUDA contexts and ONNX Runtime thread pools do not survive fork
+            raise ValueError(f"The worker pool supports CPU PyTorch backends only, not device '{pipeline.device}' "
+                             f"with backend '{pipeline.backend}'.")
+        self.pipeline = pipeline
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+        self.dead_workers = 0
+        self._context = multiprocessing.get_context("fork")
+        self._results = self._context.Queue()
+        self._workers: List[multiprocessing.Process] = []
+        self._task_queues: List[Any] = []
+        # Guards everything below; the collector thread and submitting threads both dispatch
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Future] = {}
+        self._backlog: Deque[Tuple[int, List[Image.Image]]] = deque()
+        self._idle: List[int] = []
+        self._assigned: Dict[int, int] = {}  # worker index -> id of the task it is running
+        self._task_ids = itertools.count()
+        self._collector: Optional[threading.Thread] = None
+        self._running = False
+
+    def _spawn(self, index: int):
+        # Only called from start(), before the server runs any other threads
+        tasks = self._context.Queue()
+        worker = self._context.Process(
+            target=_worker_main, args=(self.pipeline, self.threads_per_worker, index, tasks, self._results),
+            name=f"inference-worker-{index}", daemon=True
+        )
+        worker.start()
+        self._workers[index] = worker
+        self._task_queues[index] = tasks
+        self._idle.append(index)
+
+    def start(self) -> "InferenceWorkerPool":
+        if self._running:
+            return self
+        # Workers must inherit fully loaded models, not a half-finished background load
+        self.pipeline.wait_until_ready()
+        with self._lock:
+            self._workers = [None] * self.num_workers
+            self._task_queues = [None] * self.num_workers
+            for i in range(self.num_workers):
+                self._spawn(i)
+        self._running = True
+        self._collector = threading.Thread(target=self._collect, name="inference-pool-results", daemon=True)
+        self._collector.start()
+        print(f"Started {self.num_workers} inference workers with {self.threads_per_worker} thread(s) each.")
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        if not self._running:
+            return
+        self._running = False
+        with self._lock:
+            for index in self._live_workers():
+                self._task_queues[index].put(_STOP)
+            workers = [worker for worker in self._workers if worker is not None]
+            self._workers, self._task_queues, self._idle, self._assigned = [], [], [], {}
+            self._backlog.clear()
+        for worker in workers:
+            worker.join(timeout)
+        self._fail_pending(RuntimeError("The inference worker pool was stopped."))
+
+    def _dispatch(self):
+        # Caller holds self._lock
+        while self._backlog and self._idle:
+            index = self._idle.pop()
+            task_id, images = self._backlog.popleft()
+            self._assigned[index] = task_id
+            self._task_queues[index].put((task_id, images))
+
+    def _live_workers(self) -> List[int]:
+        # Caller holds self._lock
+        return [index for index, worker in enumerate(self._workers) if worker is not None]
+
+    def _drop_dead_workers(self):
+        failed = []
+        with self._lock:
+            for index in self._live_workers():
+                worker = self._workers[index]
+                if worker.is_alive():
+                    continue
+                self._workers[index] = None
+                self.dead_workers += 1
+                if index in self._idle:
+                    self._idle.remove(index)
+                task_id = self._assigned.pop(index, None)
+                if task_id is not None and task_id in self._pending:
+                    failed.append(self._pending.pop(task_id))
+                print(f"ERROR: inference worker {index} exited with code {worker.exitcode} and will not be replaced; "
+                      f"{len(self._live_workers())} of {self.num_workers} worker(s) left.")
+            if not self._live_workers():
+                # Nobody is left to run the backlog
+                failed.extend(self._pending.pop(task_id) for task_id, _ in self._backlog if task_id in self._pending)
+                self._backlog.clear()
+        for future in failed:
+            future.set_exception(RuntimeError("The inference worker running this request died."))
+
+    def _collect(self):
+        while self._running:
+            self._drop_dead_workers()
+            try:
+                index, task_id, output, error = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self._lock:
+                # A late result from a worker that was already dropped must not mark it idle again
+                if self._assigned.get(index) == task_id:
+                    del self._assigned[index]
+                    self._idle.append(index)
+                    self._dispatch()
+                future = self._pending.pop(task_id, None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(output)
+
+    def _fail_pending(self, error: Exception):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+
+    def submit(self, images: List[Image.Image]) -> Future:
+        """Queues one chunk for the next idle worker; resolves to `PredictionPipeline.run_models` output."""
+        if not self._running:
+            raise RuntimeError("The inference worker pool is not running. Call start() first.")
+        future: Future = Future()
+        with self._lock:
+            if not self._live_workers():
+                future.set_exception(RuntimeError("All inference workers have died."))
+                return future
+            task_id = next(self._task_ids)
+            self._pending[task_id] = future
+            self._backlog.append((task_id, images))
+            self._dispatch()
+        return future
+
+    def run_models(self, images: List[Image.Image]) -> Tuple[List[Dict[str, Any]], float, float]:
+        """Same contract as `PredictionPipeline.run_models`; the images are split evenly across the workers."""
+        if not images:
+            return [], 0.0, 0.0
+        with self._lock:
+            live_workers = len(self._live_workers())
+        if not live_workers:
+            print("ERROR: no inference workers left, running the models in the main process.")
+            return self.pipeline.run_models(images)
+        chunk_size = -(-len(images) // live_workers)
+        futures = [self.submit(images[start:start + chunk_size]) for start in range(0, len(images), chunk_size)]
+        outputs, gate_seconds, classifier_seconds = [], 0.0, 0.0
+        for future in futures:
+            chunk_outputs, chunk_gate_seconds, chunk_classifier_seconds = future.result()
+            outputs.extend(chunk_outputs)
+            # Summed over workers, so the stats count model time, not wall-clock time
+            gate_seconds += chunk_gate_seconds
+            classifier_seconds += chunk_classifier_seconds
+        return outputs, gate_seconds, classifier_seconds
+
+    def infer(self, images: List[Optional[Image.Image]]) -> List[Dict[str, Any]]:
+        """Same contract as `PredictionPipeline.infer`; cache lookups and stats stay in this process."""
+        return self.pipeline.infer(images, run_models=self.run_models)
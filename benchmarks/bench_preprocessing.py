@@ -0,0 +1,57 @@
+# benchmarks/bench_preprocessing.py
+#
+# Per-image preprocessing time: ViTImageProcessor called per image (old path) vs.
+# FastImagePreprocessor over a batch (new path), plus the max difference between them.
+#
+#   python -m benchmarks.bench_preprocessing --size 2000 --batch 8 --repeats 10
+
+import argparse
+import time
+import numpy as np
+import torch
+from PIL import Image
+from transformers import ViTImageProcessor
+from vitClassifier.utils.preprocessing import FastImagePreprocessor
+
+
+def synthetic_xrays(count: int, size: int):
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 256, size=(count, size, size), dtype=np.uint8)
+    return [Image.fromarray(g).convert("RGB") for g in gray]
+
+
+def time_per_image(fn, images, repeats: int) -> float:
+    fn(images)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(images)
+    return (time.perf_counter() - start) / (repeats * len(images))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ViT preprocessing paths")
+    parser.add_argument("--model-path", default="artifacts/model_training/model")
+    parser.add_argument("--size", type=int, default=2000, help="Side length of the synthetic input images")
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    processor = ViTImageProcessor.from_pretrained(args.model_path)
+    fast = FastImagePreprocessor.from_processor(processor)
+    images = synthetic_xrays(args.batch, args.size)
+
+    def per_image_processor(batch):
+        return torch.cat([processor(images=image, return_tensors="pt")["pixel_values"] for image in batch])
+
+    before = time_per_image(per_image_processor, images, args.repeats)
+    after = time_per_image(fast, images, args.repeats)
+    max_diff = (per_image_processor(images) - fast(images)).abs().max().item()
+
+    print(f"Input: {args.batch} x {args.size}x{args.size} RGB, {args.repeats} repeats")
+    print(f"ViTImageProcessor (per image): {before * 1000:8.2f} ms/image")
+    print(f"FastImagePreprocessor (batch): {after * 1000:8.2f} ms/image  ({before / after:.1f}x)")
+    print(f"Max abs difference in pixel_values: {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
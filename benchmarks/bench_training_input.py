@@ -0,0 +1,80 @@
+# benchmarks/bench_training_input.py
+#
+# Training input pipeline throughput (samples/s) with per-epoch augmentation, for both
+# TRANSFORM_MODEs: "precomputed" (normalized float tensors on disk, augmented as tensors) vs.
+# "lazy" (resized PNGs on disk, decoded/augmented/normalized on the fly), at several DataLoader
+# worker counts. Also prints the on-disk size per image of each representation.
+#
+#   python -m benchmarks.bench_training_input --images 512 --workers 0 2 4 --batch 32
+
+import argparse
+import json
+import tempfile
+import time
+import numpy as np
+from pathlib import Path
+from PIL import Image
+from datasets import ClassLabel, Dataset, Features, Image as ImageFeature
+from torch.utils.data import DataLoader
+from vitClassifier.components.data_transformation import (TRANSFORM_SPEC_FILE, build_image_transforms,
+                                                           load_transformed_dataset)
+
+SIZE, MEAN, STD = 224, [0.5, 0.5, 0.5], [0.5, 0.5, 0.5]
+
+
+def synthetic_dataset(count: int) -> Dataset:
+    rng = np.random.default_rng(0)
+    # Smooth gradients plus noise compress roughly like radiographs, unlike pure noise
+    ramp = np.linspace(0, 200, SIZE, dtype=np.float32)
+    images = [Image.fromarray((ramp[None, :] + rng.normal(0, 20, (SIZE, SIZE))).clip(0, 255).astype(np.uint8))
+              for _ in range(count)]
+    features = Features({"image": ImageFeature(), "label": ClassLabel(names=["NORMAL", "PNEUMONIA"])})
+    return Dataset.from_dict({"image": images, "label": [i % 2 for i in range(count)]}, features=features)
+
+
+def save(dataset: Dataset, path: Path, mode: str) -> float:
+    dataset.save_to_disk(str(path))
+    with open(path / TRANSFORM_SPEC_FILE, 'w') as f:
+        json.dump({"mode": mode, "size": SIZE, "image_mean": MEAN, "image_std": STD}, f)
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) / len(dataset)
+
+
+def samples_per_second(path: Path, batch_size: int, num_workers: int, epochs: int) -> float:
+    loader = DataLoader(load_transformed_dataset(path, augment=True), batch_size=batch_size, shuffle=True,
+                        num_workers=num_workers, persistent_workers=num_workers > 0)
+    next(iter(loader))  # warm-up (starts the workers)
+    seen, start = 0, time.perf_counter()
+    for _ in range(epochs):
+        for batch in loader:
+            seen += len(batch["label"])
+    return seen / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark precomputed vs. on-the-fly training transforms")
+    parser.add_argument("--images", type=int, default=512)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4])
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--epochs", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lazy = synthetic_dataset(args.images)
+        transforms = build_image_transforms(SIZE, MEAN, STD, augment=False)
+        precomputed = lazy.map(
+            lambda examples: {"pixel_values": [transforms(image.convert("RGB")) for image in examples["image"]]},
+            batched=True, remove_columns=["image"]
+        )
+        sizes = {"precomputed": save(precomputed, Path(tmp) / "precomputed", "precomputed"),
+                 "lazy": save(lazy, Path(tmp) / "lazy", "lazy")}
+
+        print(f"{args.images} images, batch {args.batch}, {args.epochs} epochs with fresh augmentation each")
+        for mode, bytes_per_image in sizes.items():
+            print(f"{mode:>12}: {bytes_per_image / 1024:8.1f} KB/image on disk")
+            for num_workers in args.workers:
+                throughput = samples_per_second(Path(tmp) / mode, args.batch, num_workers, args.epochs)
+                print(f"{'':>12}  {num_workers} worker(s): {throughput:8.1f} samples/s")
+
+
+if __name__ == "__main__":
+    main()
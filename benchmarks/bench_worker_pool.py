@@ -0,0 +1,69 @@
+# benchmarks/bench_worker_pool.py
+#
+# Classifier throughput (images/s) in-process vs. InferenceWorkerPool with 1..N forked workers,
+# feeding batches the way MicroBatchScheduler does (in-process one at a time, with a pool one per worker in flight).
+# The sanity gate is off by default so the numbers isolate the ViT; pass --gate to include it.
+#
+#   python -m benchmarks.bench_worker_pool --workers 1 2 4 8 --batch 16 --batches 20
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+from app.prediction import PredictionPipeline
+from app.sanity_gate import build_sanity_gate
+from app.worker_pool import InferenceWorkerPool
+
+
+def synthetic_xrays(count: int, size: int):
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 256, size=(count, size, size), dtype=np.uint8)
+    return [Image.fromarray(g).convert("RGB") for g in gray]
+
+
+def images_per_second(infer, batches, in_flight: int = 1) -> float:
+    infer(batches[0])  # warm-up
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=in_flight) as executor:
+        list(executor.map(infer, batches))
+    return sum(len(batch) for batch in batches) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the multi-process inference worker pool")
+    parser.add_argument("--model-path", default="artifacts/model_training/model")
+    parser.add_argument("--backend", default="fp32", choices=("fp32", "int8"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--size", type=int, default=1024, help="Side length of the synthetic input images")
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--gate", action="store_true", help="Run the ResNet-50 sanity gate as well")
+    args = parser.parse_args()
+
+    gate = build_sanity_gate(mode="model" if args.gate else "none", max_batch_size=args.batch)
+    # No cache: every batch must reach the models
+    pipeline = PredictionPipeline(model_path=args.model_path, max_batch_size=args.batch, sanity_gate=gate, backend=args.backend)
+    images = synthetic_xrays(args.batch, args.size)
+    # Distinct objects per batch, as the scheduler would see them
+    batches = [[image.copy() for image in images] for _ in range(args.batches)]
+
+    print(f"{os.cpu_count()} cores, backend {args.backend}, {args.batches} batches of {args.batch} x {args.size}x{args.size}")
+    # Pools are forked first: the parent must not have run inference (and started its thread pools) before forking
+    results = {}
+    for num_workers in args.workers:
+        pool = InferenceWorkerPool(pipeline, num_workers).start()
+        try:
+            results[f"{num_workers} worker(s) x {pool.threads_per_worker} thread(s)"] = images_per_second(pool.infer, batches, num_workers)
+        finally:
+            pool.stop()
+    results["in-process"] = images_per_second(pipeline.infer, batches)
+
+    baseline = results["in-process"]
+    for name, throughput in results.items():
+        print(f"{name:>30}: {throughput:8.1f} images/s  ({throughput / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
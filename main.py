@@ -3,6 +3,7 @@ from vitClassifier.pipeline.stage_01_data_ingestion import DataIngestionTraining
 from vitClassifier.pipeline.stage_02_data_transformation import DataTransformationTrainingPipeline
 from vitClassifier.pipeline.stage_03_model_training import ModelTrainingPipeline
 from vitClassifier.pipeline.stage_04_model_evaluation import ModelEvaluationPipeline
+from vitClassifier.pipeline.stage_05_model_export import ModelExportPipeline
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -20,4 +21,6 @@ if __name__ == '__main__':
     run_pipeline("Data Ingestion stage", DataIngestionTrainingPipeline)
     run_pipeline("Data Transformation stage", DataTransformationTrainingPipeline)
     run_pipeline("Model Training stage", ModelTrainingPipeline)
+    # Export before evaluation, which scores the int8/ONNX exports of the model just trained
+    run_pipeline("Model Export stage", ModelExportPipeline)
     run_pipeline("Model Evaluation stage", ModelEvaluationPipeline)
\ No newline at end of file
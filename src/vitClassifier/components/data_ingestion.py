@@ -1,10 +1,38 @@
 import os
+import hashlib
+import io
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from PIL import Image
 from vitClassifier import logger
 from vitClassifier.entity.config_entity import DataIngestionConfig
 import kaggle
 
+SPLITS = ("train", "test", "val")
+MANIFEST_COLUMNS = ["path", "split", "label", "size", "mtime_ns", "sha256", "width", "height", "valid", "error"]
+
+
+def inspect_image(path: Path, split: str, label: str) -> dict:
+    """
+    One manifest row: file size, mtime, content hash and dimensions. The image is fully decoded,
+    so corrupt and truncated JPEGs are caught here instead of in a later stage's `.map()`.
+    """
+    stat = path.stat()
+    row = {"path": str(path), "split": split, "label": label, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+           "sha256": None, "width": None, "height": None, "valid": False, "error": None}
+    try:
+        data = path.read_bytes()
+        row["sha256"] = hashlib.sha256(data).hexdigest()
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            row["width"], row["height"] = image.size
+        row["valid"] = True
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
 class DataIngestion:
     def __init__(self, config: DataIngestionConfig):
         self.config = config
@@ -20,7 +48,8 @@ class DataIngestion:
             download_path = self.config.unzip_dir
             
             expected_data_folder = download_path / "chest_xray"
-            if expected_data_folder.exists():
+            # An interrupted unzip can leave the folder behind without any images in it
+            if expected_data_folder.exists() and any(expected_data_folder.glob('*/*/*.jpeg')):
                 logger.info(f"Dataset already exists at {expected_data_folder}. Skipping download.")
                 return
 
@@ -34,24 +63,51 @@ class DataIngestion:
             logger.error(f"Failed to download dataset from Kaggle. Error: {e}")
             raise e
 
-    def create_dataframes(self):
+    def build_manifest(self) -> pd.DataFrame:
         """
-        Scans train, test, and val directories and creates separate DataFrames.
+        Inspects every image of every split on a thread pool and saves the manifest. Files whose
+        size and mtime match the previous manifest are not re-read, so re-runs only scan what changed.
         """
         source_root = self.config.unzip_dir / "chest_xray"
-        
+        previous = {}
+        if self.config.manifest_path.exists():
+            previous = {row["path"]: row for row in pd.read_csv(self.config.manifest_path).to_dict("records")}
+
+        reused, to_inspect = [], []
+        for split in SPLITS:
+            # Using .glob to find all .jpeg files in NORMAL and PNEUMONIA subfolders
+            for file in sorted((source_root / split).glob('*/*.jpeg')):
+                stat = file.stat()
+                old = previous.get(str(file))
+                if old is not None and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+                    reused.append(old)
+                else:
+                    to_inspect.append((file, split, file.parent.name)) # label: NORMAL or PNEUMONIA
+
+        logger.info(f"Manifest: {len(reused)} unchanged files, inspecting {len(to_inspect)} new or changed files "
+                    f"with {self.config.num_workers} threads.")
+        # Hashing and JPEG decoding release the GIL, so threads scale across cores
+        with ThreadPoolExecutor(max_workers=self.config.num_workers) as pool:
+            inspected = list(pool.map(lambda args: inspect_image(*args), to_inspect))
+
+        manifest = pd.DataFrame(reused + inspected, columns=MANIFEST_COLUMNS).sort_values("path", ignore_index=True)
+        manifest.to_csv(self.config.manifest_path, index=False)
+
+        invalid = manifest[~manifest["valid"].astype(bool)]
+        for row in invalid.itertuples():
+            logger.warning(f"Unreadable image excluded from the dataset: {row.path} ({row.error})")
+        logger.info(f"Saved manifest of {len(manifest)} images ({len(invalid)} unreadable) to {self.config.manifest_path}")
+        return manifest
+
+    def create_dataframes(self, manifest: pd.DataFrame):
+        """
+        Creates separate train, test, and val DataFrames from the readable images in the manifest.
+        """
+        valid = manifest[manifest["valid"].astype(bool)]
         # Helper function to create a dataframe for a given split (train/test/val)
         def _create_df_for_split(split_name: str, save_path: Path):
-            split_path = source_root / split_name
-            file_names, labels = [], []
-            
-            # Using .glob to find all .jpeg files in NORMAL and PNEUMONIA subfolders
-            for file in sorted(split_path.glob('*/*.jpeg')):
-                label = file.parent.name # NORMAL or PNEUMONIA
-                labels.append(label)
-                file_names.append(str(file))
-            
-            df = pd.DataFrame({"image": file_names, "label": labels})
+            rows = valid[valid["split"] == split_name]
+            df = pd.DataFrame({"image": rows["path"].tolist(), "label": rows["label"].tolist()})
             df.to_csv(save_path, index=False)
             logger.info(f"Created and saved {split_name} DataFrame to {save_path}")
 
@@ -63,5 +119,6 @@ class DataIngestion:
     def ingest_data(self):
         logger.info("Starting data ingestion process.")
         self.download_dataset()
-        self.create_dataframes()
+        manifest = self.build_manifest()
+        self.create_dataframes(manifest)
         logger.info("Data ingestion process completed.")
\ No newline at end of file
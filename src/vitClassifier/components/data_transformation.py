@@ -1,13 +1,72 @@
 # src/vitClassifier/components/data_transformation.py
 
+import json
 import pandas as pd
-from datasets import Dataset, Image, ClassLabel
+import torch
+from pathlib import Path
+from datasets import Dataset, Image, ClassLabel, load_from_disk
 from imblearn.over_sampling import RandomOverSampler
 from vitClassifier.entity.config_entity import DataTransformationConfig
 from vitClassifier import logger
 # --- NEW IMPORTS ---
+from PIL import Image as PILImage
 from transformers import ViTImageProcessor
 from torchvision.transforms import (Compose, Resize, ToTensor, Normalize, RandomRotation, RandomHorizontalFlip)
+from vitClassifier.utils.augmentation import TensorAugmentedDataset
+
+TRANSFORM_MODES = ("precomputed", "lazy")
+
+# "oversample" duplicates minority rows on disk; the others store each image once and balance during training
+BALANCING_MODES = ("oversample", "weighted_sampler", "class_weighted_loss")
+
+# Written next to each dataset: how it was transformed, and the size/mean/std needed to finish the job at load time
+TRANSFORM_SPEC_FILE = "transform_spec.json"
+
+
+def build_image_transforms(size: int, image_mean, image_std, augment: bool) -> Compose:
+    """PIL image -> normalized float tensor, with random rotation/flip when `augment` is set (training only)."""
+    normalize = Normalize(mean=image_mean, std=image_std)
+    if augment:
+        return Compose([Resize((size, size)), RandomRotation(15), RandomHorizontalFlip(), ToTensor(), normalize])
+    return Compose([Resize((size, size)), ToTensor(), normalize])
+
+
+def load_transformed_dataset(path: Path, augment: bool = False):
+    """
+    Loads a dataset written by DataTransformation; each row yields {"pixel_values", "label"}.
+    Lazy datasets get an on-the-fly transform that turns the stored resized images into `pixel_values`.
+    Precomputed ones are returned as torch tensors. With `augment`, random rotation/flip is drawn
+    per access, so every epoch sees freshly augmented samples in both modes.
+    """
+    dataset = load_from_disk(str(path))
+    spec_path = Path(path) / TRANSFORM_SPEC_FILE
+    spec = None
+    if spec_path.exists():
+        with open(spec_path) as f:
+            spec = json.load(f)
+
+    # Lazy specs written before the "mode" key was added have no such key
+    if spec is None or spec.get("mode", "lazy") == "precomputed":
+        dataset = dataset.with_format("torch")
+        if not augment:
+            return dataset
+        if spec is None:
+            # Written before augmentation moved to load time: its pixels were already augmented once
+            logger.warning(f"No {TRANSFORM_SPEC_FILE} in {path}; re-run the data transformation stage for per-epoch augmentation.")
+            return dataset
+        return TensorAugmentedDataset(dataset, spec["image_mean"], spec["image_std"])
+
+    transforms = build_image_transforms(spec["size"], spec["image_mean"], spec["image_std"], augment)
+
+    def apply_transforms(examples):
+        return {
+            "pixel_values": torch.stack([transforms(image.convert("RGB")) for image in examples["image"]]),
+            "label": torch.tensor(examples["label"]),
+        }
+
+    dataset.set_transform(apply_transforms)
+    return dataset
+
 
 class DataTransformation:
     def __init__(self, config: DataTransformationConfig, random_state: int, model_name: str):
@@ -16,21 +75,30 @@ class DataTransformation:
         self.model_name = model_name # <-- Need model_name to load the correct processor
 
     def transform_data(self):
-        # --- 1. Load DataFrames and apply Oversampling (same as before) ---
+        if self.config.transform_mode not in TRANSFORM_MODES:
+            raise ValueError(f"Unknown TRANSFORM_MODE '{self.config.transform_mode}'. Expected one of {TRANSFORM_MODES}.")
+        if self.config.balancing not in BALANCING_MODES:
+            raise ValueError(f"Unknown BALANCING '{self.config.balancing}'. Expected one of {BALANCING_MODES}.")
+
+        # --- 1. Load DataFrames (oversampled only with BALANCING: oversample) ---
         train_df = pd.read_csv(self.config.train_data_path)
         test_df = pd.read_csv(self.config.test_data_path)
         val_df = pd.read_csv(self.config.val_data_path)
-        
-        y = train_df[['label']]
-        X = train_df.drop(['label'], axis=1)
-        ros = RandomOverSampler(random_state=self.random_state)
-        X_resampled, y_resampled = ros.fit_resample(X, y)
-        train_df_balanced = pd.concat([X_resampled, y_resampled], axis=1)
-        
+
+        train_df_balanced = train_df
+        if self.config.balancing == "oversample":
+            y = train_df[['label']]
+            X = train_df.drop(['label'], axis=1)
+            ros = RandomOverSampler(random_state=self.random_state)
+            X_resampled, y_resampled = ros.fit_resample(X, y)
+            train_df_balanced = pd.concat([X_resampled, y_resampled], axis=1)
+        else:
+            logger.info(f"Storing each training image once; classes are balanced at training time ({self.config.balancing}).")
+
         train_dataset = Dataset.from_pandas(train_df_balanced).cast_column("image", Image())
         test_dataset = Dataset.from_pandas(test_df).cast_column("image", Image())
         val_dataset = Dataset.from_pandas(val_df).cast_column("image", Image())
-        
+
         # --- 2. Label Encoding (same as before) ---
         labels_list = train_df_balanced['label'].unique().tolist()
         class_labels = ClassLabel(num_classes=len(labels_list), names=labels_list)
@@ -43,29 +111,40 @@ class DataTransformation:
         test_dataset = test_dataset.map(map_label2id, batched=True).cast_column('label', class_labels)
         val_dataset = val_dataset.map(map_label2id, batched=True).cast_column('label', class_labels)
 
-        # --- 3. THE NEW LOGIC: Preprocess images with .map() ---
-        logger.info("Starting image preprocessing with .map(). This may take a few minutes...")
         processor = ViTImageProcessor.from_pretrained(self.model_name)
         image_mean, image_std = processor.image_mean, processor.image_std
         size = processor.size["height"]
-        normalize = Normalize(mean=image_mean, std=image_std)
-
-        # Define transforms
-        _train_transforms = Compose([Resize((size, size)), RandomRotation(15), RandomHorizontalFlip(), ToTensor(), normalize])
-        _val_test_transforms = Compose([Resize((size, size)), ToTensor(), normalize])
-        
-        def apply_train_transforms(examples):
-            examples['pixel_values'] = [_train_transforms(image.convert("RGB")) for image in examples['image']]
-            return examples
+        num_proc = self.config.num_proc if self.config.num_proc > 1 else None
+
+        if self.config.transform_mode == "lazy":
+            # --- 3a. Store only images resized to the model input; normalization and augmentation run at load time ---
+            logger.info(f"Resizing images to {size}x{size} for on-the-fly transforms (num_proc={num_proc})...")
+
+            def resize_images(examples):
+                examples['image'] = [image.resize((size, size), PILImage.BILINEAR) for image in examples['image']]
+                return examples
+
+            train_dataset = train_dataset.map(resize_images, batched=True, num_proc=num_proc)
+            test_dataset = test_dataset.map(resize_images, batched=True, num_proc=num_proc)
+            val_dataset = val_dataset.map(resize_images, batched=True, num_proc=num_proc)
+            self._save_datasets(train_dataset, test_dataset, val_dataset, size, image_mean, image_std)
+            logger.info("Data Transformation complete. Resized datasets saved; pixel values are computed on the fly.")
+            return
 
-        def apply_val_test_transforms(examples):
-            examples['pixel_values'] = [_val_test_transforms(image.convert("RGB")) for image in examples['image']]
+        # --- 3. THE NEW LOGIC: Preprocess images with .map() ---
+        logger.info("Starting image preprocessing with .map(). This may take a few minutes...")
+
+        # No augmentation here: it is applied per epoch at load time (see load_transformed_dataset)
+        _transforms = build_image_transforms(size, image_mean, image_std, augment=False)
+
+        def apply_transforms(examples):
+            examples['pixel_values'] = [_transforms(image.convert("RGB")) for image in examples['image']]
             return examples
-            
+
         # Use .map() to apply transforms and create 'pixel_values' column
-        train_dataset = train_dataset.map(apply_train_transforms, batched=True)
-        test_dataset = test_dataset.map(apply_val_test_transforms, batched=True)
-        val_dataset = val_dataset.map(apply_val_test_transforms, batched=True)
+        train_dataset = train_dataset.map(apply_transforms, batched=True, num_proc=num_proc)
+        test_dataset = test_dataset.map(apply_transforms, batched=True, num_proc=num_proc)
+        val_dataset = val_dataset.map(apply_transforms, batched=True, num_proc=num_proc)
 
         # Remove the original 'image' column to save space
         train_dataset = train_dataset.remove_columns(['image'])
@@ -73,8 +152,15 @@ class DataTransformation:
         val_dataset = val_dataset.remove_columns(['image'])
 
         # --- 4. Save the fully processed datasets ---
-        train_dataset.save_to_disk(str(self.config.train_dataset_path))
-        test_dataset.save_to_disk(str(self.config.test_dataset_path))
-        val_dataset.save_to_disk(str(self.config.val_dataset_path))
-        
-        logger.info("Data Transformation complete. Fully preprocessed datasets saved.")
\ No newline at end of file
+        self._save_datasets(train_dataset, test_dataset, val_dataset, size, image_mean, image_std)
+
+        logger.info("Data Transformation complete. Fully preprocessed datasets saved.")
+
+    def _save_datasets(self, train_dataset: Dataset, test_dataset: Dataset, val_dataset: Dataset,
+                       size: int, image_mean, image_std):
+        spec = {"mode": self.config.transform_mode, "size": size, "image_mean": list(image_mean), "image_std": list(image_std)}
+        for dataset, path in ((train_dataset, self.config.train_dataset_path), (test_dataset, self.config.test_dataset_path),
+                              (val_dataset, self.config.val_dataset_path)):
+            dataset.save_to_disk(str(path))
+            with open(Path(path) / TRANSFORM_SPEC_FILE, 'w') as f:
+                json.dump(spec, f, indent=4)
@@ -0,0 +1,75 @@
+# src/vitClassifier/components/embedding_cache.py
+
+import json
+import numpy as np
+import torch
+from pathlib import Path
+from typing import Tuple
+from datasets import load_from_disk
+from torch.utils.data import DataLoader
+from transformers import ViTForImageClassification
+from vitClassifier.components.data_transformation import load_transformed_dataset
+from vitClassifier import logger
+
+
+class EmbeddingCache:
+    """
+    [CLS] embeddings of a frozen ViT backbone, one memory-mapped `.npy` file per split. These are
+    exactly the inputs of `ViTForImageClassification.classifier`, so a head trained on them drops
+    straight back into the full model. A split is recomputed only when its dataset (by fingerprint)
+    or the backbone changes.
+    """
+
+    def __init__(self, cache_dir: Path, backbone_name: str, batch_size: int = 64, num_workers: int = 0):
+        self.cache_dir = Path(cache_dir)
+        self.backbone_name = backbone_name
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+
+    def _paths(self, split: str) -> Tuple[Path, Path, Path]:
+        return (self.cache_dir / f"{split}_embeddings.npy", self.cache_dir / f"{split}_labels.npy",
+                self.cache_dir / f"{split}_meta.json")
+
+    def _is_fresh(self, split: str, meta: dict) -> bool:
+        embeddings_path, labels_path, meta_path = self._paths(split)
+        if not (embeddings_path.exists() and labels_path.exists() and meta_path.exists()):
+            return False
+        with open(meta_path) as f:
+            return json.load(f) == meta
+
+    def get(self, split: str, dataset_path: Path, model: ViTForImageClassification) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (embeddings, labels) for a split, running `model.vit` over it only if the cache is stale."""
+        meta = {"backbone": self.backbone_name, "dataset_fingerprint": load_from_disk(str(dataset_path))._fingerprint}
+        embeddings_path, labels_path, meta_path = self._paths(split)
+        if self._is_fresh(split, meta):
+            logger.info(f"Using cached {split} embeddings from {embeddings_path}")
+        else:
+            self._build(dataset_path, model, embeddings_path, labels_path)
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f, indent=4)
+        return np.load(embeddings_path, mmap_mode="r"), np.load(labels_path)
+
+    def _build(self, dataset_path: Path, model: ViTForImageClassification, embeddings_path: Path, labels_path: Path):
+        # No augmentation: the embeddings are computed once and reused by every head-training run
+        dataset = load_transformed_dataset(dataset_path)
+        loader = DataLoader(dataset, batch_size=self.batch_size, num_workers=self.num_workers)
+        device = next(model.parameters()).device
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        embeddings = np.lib.format.open_memmap(embeddings_path, mode="w+", dtype=np.float32,
+                                               shape=(len(dataset), model.config.hidden_size))
+        labels = np.empty(len(dataset), dtype=np.int64)
+        logger.info(f"Computing [CLS] embeddings of {len(dataset)} images from {dataset_path}...")
+        offset = 0
+        model.eval()
+        with torch.inference_mode():
+            for batch in loader:
+                hidden = model.vit(pixel_values=batch["pixel_values"].to(device)).last_hidden_state
+                count = hidden.shape[0]
+                embeddings[offset:offset + count] = hidden[:, 0, :].float().cpu().numpy()
+                labels[offset:offset + count] = batch["label"].numpy()
+                offset += count
+        embeddings.flush()
+        del embeddings
+        np.save(labels_path, labels)
+        logger.info(f"Saved embeddings to {embeddings_path}")
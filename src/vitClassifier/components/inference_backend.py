@@ -0,0 +1,90 @@
+# src/vitClassifier/components/inference_backend.py
+
+import torch
+from pathlib import Path
+from typing import Optional
+from transformers import ViTConfig, ViTForImageClassification
+from vitClassifier import logger
+
+BACKENDS = ("fp32", "int8", "onnx")
+
+
+def quantize_dynamic_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic int8 quantization of every Linear layer (weights int8, activations quantized on the fly)."""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class LogitsOnly(torch.nn.Module):
+    """Wraps a HF classifier so that it maps `pixel_values` -> `logits` tensors (needed for ONNX export)."""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.model(pixel_values=pixel_values).logits
+
+
+class TorchBackend:
+    """Runs an eager PyTorch classifier (fp32 or dynamically quantized int8)."""
+
+    def __init__(self, model: torch.nn.Module, config: ViTConfig, name: str, device: str = "cpu"):
+        self.model = model.to(device).eval()
+        self.config = config
+        self.name = name
+        self.device = device
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.model(pixel_values=pixel_values.to(self.device)).logits.float().cpu()
+
+
+class OnnxBackend:
+    """Runs the exported ONNX graph with ONNX Runtime on CPU."""
+
+    def __init__(self, onnx_path: Path, config: ViTConfig, num_threads: Optional[int] = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The 'onnx' backend requires the onnxruntime package. Install it with `pip install onnxruntime`.") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(onnx_path), sess_options=options, providers=["CPUExecutionProvider"])
+        self.config = config
+        self.name = "onnx"
+        self.device = "cpu"
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        inputs = {"pixel_values": pixel_values.detach().cpu().numpy().astype("float32", copy=False)}
+        return torch.from_numpy(self.session.run(["logits"], inputs)[0])
+
+
+def load_backend(backend: str, model_path: Path, quantized_model_path: Optional[Path] = None,
+                 onnx_model_path: Optional[Path] = None, device: str = "cpu", num_threads: Optional[int] = None):
+    """
+    Loads the classifier saved at `model_path` with the requested backend:
+    'fp32' (eager PyTorch), 'int8' (dynamic-quantized PyTorch, CPU only) or 'onnx' (ONNX Runtime, CPU only).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Expected one of {BACKENDS}.")
+
+    config = ViTConfig.from_pretrained(model_path)
+    if backend == "onnx":
+        if onnx_model_path is None or not Path(onnx_model_path).exists():
+            raise FileNotFoundError(f"ONNX model not found at {onnx_model_path}. Run the model export stage first.")
+        return OnnxBackend(Path(onnx_model_path), config, num_threads=num_threads)
+
+    model = ViTForImageClassification.from_pretrained(model_path)
+    if backend == "fp32":
+        return TorchBackend(model, config, name="fp32", device=device)
+
+    # Dynamic quantization is deterministic, so a missing export can be rebuilt from the fp32 weights
+    model = quantize_dynamic_int8(model.eval())
+    if quantized_model_path is not None and Path(quantized_model_path).exists():
+        model.load_state_dict(torch.load(quantized_model_path, map_location="cpu"))
+    else:
+        logger.info("No exported int8 weights found, quantizing the fp32 model on load.")
+    return TorchBackend(model, config, name="int8", device="cpu")
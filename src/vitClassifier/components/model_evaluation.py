@@ -2,74 +2,124 @@
 
 import mlflow
 import mlflow.pytorch
+import time
+import numpy as np
 import torch
 import json
 from pathlib import Path
-from datasets import load_from_disk
-from transformers import (ViTForImageClassification, ViTImageProcessor, Trainer, TrainingArguments, DefaultDataCollator)
-from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+from torch.utils.data import DataLoader
 from vitClassifier.entity.config_entity import EvaluationConfig
+from vitClassifier.components.data_transformation import load_transformed_dataset
+from vitClassifier.components.inference_backend import load_backend
 from vitClassifier.utils.common import read_yaml # Keep this if you need it, but it's not used here
 from vitClassifier import logger
 
+
+def scores_from_confusion(confusion: torch.Tensor) -> dict:
+    """Accuracy and macro precision/recall/F1 from a (true x predicted) confusion matrix, as sklearn computes them."""
+    confusion = confusion.double()
+    true_positives = confusion.diag()
+    predicted, actual = confusion.sum(0), confusion.sum(1)
+    # A class that is never predicted (or never present) scores 0, like sklearn's zero_division default
+    precision = torch.where(predicted > 0, true_positives / predicted.clamp(min=1), torch.zeros_like(predicted))
+    recall = torch.where(actual > 0, true_positives / actual.clamp(min=1), torch.zeros_like(actual))
+    f1 = torch.where(precision + recall > 0, 2 * precision * recall / (precision + recall).clamp(min=1e-12), torch.zeros_like(precision))
+    return {
+        "accuracy": (true_positives.sum() / confusion.sum()).item(),
+        "f1_score": f1.mean().item(),
+        "precision": precision.mean().item(),
+        "recall": recall.mean().item(),
+    }
+
+
+class BackendStats:
+    """Running confusion matrix and per-batch latencies of one backend."""
+
+    def __init__(self, num_labels: int):
+        self.num_labels = num_labels
+        self.confusion = torch.zeros((num_labels, num_labels), dtype=torch.int64)
+        self.latencies = []
+        self.images = 0
+
+    def update(self, labels: torch.Tensor, logits: torch.Tensor, seconds: float):
+        predictions = logits.argmax(-1).cpu()
+        self.confusion += torch.bincount(labels * self.num_labels + predictions,
+                                         minlength=self.num_labels ** 2).view(self.num_labels, self.num_labels)
+        self.latencies.append(seconds)
+        self.images += len(labels)
+
+    def report(self) -> dict:
+        latencies_ms = np.array(self.latencies) * 1000
+        return {
+            **scores_from_confusion(self.confusion),
+            "confusion_matrix": self.confusion.tolist(),
+            "images_per_second": self.images / sum(self.latencies) if self.latencies else 0.0,
+            "batch_latency_ms_p50": float(np.percentile(latencies_ms, 50)),
+            "batch_latency_ms_p90": float(np.percentile(latencies_ms, 90)),
+            "batch_latency_ms_p99": float(np.percentile(latencies_ms, 99)),
+        }
+
+
 class ModelEvaluation:
     def __init__(self, config: EvaluationConfig):
         self.config = config
 
-    def evaluate(self):
-        # Determine device
+    def load_backends(self) -> dict:
+        """
+        The configured backends. The int8/ONNX exports are stage dependencies, so DVC re-exports before
+        evaluating a retrained model; exports missing when the stage is run by hand are skipped.
+        """
+        # Determine device (the int8 and onnx backends always run on CPU)
         device = "cuda" if torch.cuda.is_available() else "cpu"
+        backends = {}
+        for name in self.config.backends:
+            try:
+                backends[name] = load_backend(name, self.config.path_of_model, self.config.quantized_model_path,
+                                              self.config.onnx_model_path, device=device if name == "fp32" else "cpu")
+            except (FileNotFoundError, ImportError) as e:
+                logger.warning(f"Skipping backend '{name}' in evaluation: {e}")
+        if "fp32" not in backends:
+            raise ValueError("EVAL_BACKENDS must include 'fp32', which the reported test metrics are based on.")
+        return backends
+
+    def evaluate(self):
+        backends = self.load_backends()
+        num_labels = backends["fp32"].config.num_labels
 
-        # Load the best model from the training stage and move it to the correct device
-        model_path = str(self.config.path_of_model)
-        model = ViTForImageClassification.from_pretrained(model_path).to(device)
-        
-        # Load the pre-processed test dataset
-        test_data = load_from_disk(str(self.config.test_dataset_path))
-        
-        # We DO NOT need transforms here because the data is already processed
-        # test_data.set_transform(...) # REMOVED
-
-        # Use the default collator which handles 'pixel_values' and 'label'
-        data_collator = DefaultDataCollator()
-
-        # Dummy trainer for running predictions
-        eval_args = TrainingArguments(
-            output_dir="./eval_output", # Temporary directory
-            per_device_eval_batch_size=self.config.batch_size,
-            report_to="none"
-        )
-        trainer = Trainer(
-            model=model,
-            args=eval_args,
-            data_collator=data_collator
-        )
+        # Stream the test dataset; every batch is decoded once and fed to all backends
+        test_data = load_transformed_dataset(self.config.test_dataset_path)
+        loader = DataLoader(test_data, batch_size=self.config.batch_size, num_workers=self.config.num_workers)
+        stats = {name: BackendStats(num_labels) for name in backends}
 
         # --- Run Predictions ---
-        logger.info("Running final evaluation on the test set...")
-        outputs = trainer.predict(test_data)
-        y_true = outputs.label_ids
-        y_pred = outputs.predictions.argmax(1)
+        logger.info(f"Running final evaluation on the test set with backends {list(backends)}...")
+        with torch.inference_mode():
+            for batch in loader:
+                labels = batch["label"].cpu()
+                for name, backend in backends.items():
+                    start = time.perf_counter()
+                    logits = backend(batch["pixel_values"]).cpu()
+                    stats[name].update(labels, logits, time.perf_counter() - start)
+
+        reports = {name: backend_stats.report() for name, backend_stats in stats.items()}
+        for name, report in reports.items():
+            logger.info(f"Test set [{name}]: {report}")
 
         # --- Calculate Metrics ---
-        scores = {
-            "accuracy": accuracy_score(y_true, y_pred),
-            "f1_score": f1_score(y_true, y_pred, average='macro'),
-            "precision": precision_score(y_true, y_pred, average='macro'),
-            "recall": recall_score(y_true, y_pred, average='macro')
-        }
+        # The top-level scores stay those of the fp32 model; every backend is reported under "backends"
+        scores = {key: reports["fp32"][key] for key in ("accuracy", "f1_score", "precision", "recall")}
         logger.info(f"Test Set Metrics: {scores}")
 
         # --- Save Metrics to a JSON file ---
-        metrics_path = Path(self.config.metrics_file_name) 
-        
+        metrics_path = Path(self.config.metrics_file_name)
+
         # Now create the directory
         metrics_path.parent.mkdir(parents=True, exist_ok=True)
-        
+
         with open(metrics_path, 'w') as f:
-            json.dump(scores, f, indent=4)
+            json.dump({**scores, "backends": reports}, f, indent=4)
         logger.info(f"Metrics saved to {metrics_path}")
-        
+
         # --- Log to MLflow ---
         mlflow.set_tracking_uri(self.config.mlflow_uri)
         mlflow.set_experiment("Pneumonia-ViT-Classification")
@@ -78,7 +128,11 @@ class ModelEvaluation:
             logger.info("Logging parameters and metrics to MLflow...")
             mlflow.log_params(self.config.all_params)
             mlflow.log_metrics(scores)
-            
+            mlflow.log_metrics({
+                f"{name}_{key}": value for name, report in reports.items()
+                for key, value in report.items() if isinstance(value, float)
+            })
+
             # --- THIS IS THE FINAL FIX ---
             # Instead of logging the model object, log the directory where the
             # trained model was already saved by the Trainer.
@@ -86,4 +140,4 @@ class ModelEvaluation:
             model_dir_path = str(self.config.path_of_model)
             mlflow.log_artifact(model_dir_path, artifact_path="model")
 
-            logger.info("Successfully logged artifacts to MLflow.")
\ No newline at end of file
+            logger.info("Successfully logged artifacts to MLflow.")
@@ -0,0 +1,88 @@
+# src/vitClassifier/components/model_export.py
+
+import json
+import torch
+from pathlib import Path
+from transformers import ViTForImageClassification
+from vitClassifier.entity.config_entity import ExportConfig
+from vitClassifier.components.data_transformation import load_transformed_dataset
+from vitClassifier.components.inference_backend import LogitsOnly, quantize_dynamic_int8, load_backend
+from vitClassifier import logger
+
+class ModelExport:
+    def __init__(self, config: ExportConfig):
+        self.config = config
+
+    def export_quantized(self, model: ViTForImageClassification) -> Path:
+        """Saves the state dict of a dynamic-int8-quantized copy of the model."""
+        quantized = quantize_dynamic_int8(model)
+        path = self.config.quantized_model_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        torch.save(quantized.state_dict(), path)
+        logger.info(f"Saved dynamic int8 model to {path}")
+        return path
+
+    def export_onnx(self, model: ViTForImageClassification) -> Path:
+        """Exports `pixel_values -> logits` as an ONNX graph with a dynamic batch dimension."""
+        size = model.config.image_size
+        dummy = torch.zeros(1, model.config.num_channels, size, size)
+        path = self.config.onnx_model_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        torch.onnx.export(
+            LogitsOnly(model), (dummy,), str(path),
+            input_names=["pixel_values"], output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=self.config.onnx_opset,
+        )
+        logger.info(f"Saved ONNX model to {path}")
+        return path
+
+    def check_parity(self) -> dict:
+        """
+        Runs fp32, int8 and ONNX over the test set and compares each against the fp32
+        model: accuracy, accuracy drop, prediction agreement and max absolute logit difference.
+        """
+        test_data = load_transformed_dataset(self.config.test_dataset_path)
+        backends = {
+            name: load_backend(name, self.config.model_path, self.config.quantized_model_path, self.config.onnx_model_path)
+            for name in ("fp32", "int8", "onnx")
+        }
+
+        logits = {name: [] for name in backends}
+        labels = []
+        for batch in test_data.iter(batch_size=self.config.batch_size):
+            labels.append(batch["label"])
+            for name, backend in backends.items():
+                logits[name].append(backend(batch["pixel_values"]))
+
+        labels = torch.cat(labels)
+        logits = {name: torch.cat(chunks) for name, chunks in logits.items()}
+        reference = logits["fp32"]
+        fp32_accuracy = (reference.argmax(-1) == labels).float().mean().item()
+
+        report = {}
+        for name, backend_logits in logits.items():
+            accuracy = (backend_logits.argmax(-1) == labels).float().mean().item()
+            report[name] = {
+                "accuracy": accuracy,
+                "accuracy_drop": fp32_accuracy - accuracy,
+                "agreement_with_fp32": (backend_logits.argmax(-1) == reference.argmax(-1)).float().mean().item(),
+                "max_abs_logit_diff": (backend_logits - reference).abs().max().item(),
+                "passed": fp32_accuracy - accuracy <= self.config.max_accuracy_drop,
+            }
+            logger.info(f"Parity [{name}]: {report[name]}")
+            if not report[name]["passed"]:
+                logger.warning(f"Backend '{name}' loses {report[name]['accuracy_drop']:.4f} accuracy vs fp32 "
+                               f"(allowed: {self.config.max_accuracy_drop}). Do not serve it.")
+        return report
+
+    def export(self):
+        model = ViTForImageClassification.from_pretrained(self.config.model_path).eval()
+        self.export_quantized(model)
+        self.export_onnx(model)
+
+        report = self.check_parity()
+        self.config.parity_report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.config.parity_report_path, 'w') as f:
+            json.dump(report, f, indent=4)
+        logger.info(f"Parity report saved to {self.config.parity_report_path}")
@@ -1,11 +1,63 @@
 # src/vitClassifier/components/model_training.py
 
+import copy
+import json
+import time
+import numpy as np
 import torch
 from datasets import load_from_disk
+from torch.utils.data import DataLoader, TensorDataset, WeightedRandomSampler
 from transformers import (ViTImageProcessor, ViTForImageClassification, TrainingArguments, Trainer, DefaultDataCollator)
 from vitClassifier.entity.config_entity import TrainingConfig
+from vitClassifier.components.data_transformation import BALANCING_MODES, load_transformed_dataset
+from vitClassifier.components.training_callbacks import (ThroughputCallback, TimeBudgetCallback,
+                                                         RecordingEarlyStoppingCallback, stop_reason)
+from vitClassifier.components.embedding_cache import EmbeddingCache
 from vitClassifier import logger
 import evaluate
+from sklearn.metrics import f1_score
+
+TRAINING_MODES = ("full", "head_only")
+
+# Stopping metrics head-only training computes on the cached validation embeddings
+HEAD_METRICS = ("accuracy", "f1", "loss")
+
+
+class BalancedTrainer(Trainer):
+    """
+    Trainer that balances classes at training time instead of duplicating rows on disk:
+    'weighted_sampler' draws each epoch's samples with probability inversely proportional to
+    their class frequency, 'class_weighted_loss' scales the cross-entropy of each class the same way.
+    """
+
+    def __init__(self, *args, balancing: str = "oversample", train_labels=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if balancing not in BALANCING_MODES:
+            raise ValueError(f"Unknown BALANCING '{balancing}'. Expected one of {BALANCING_MODES}.")
+        self.balancing = balancing
+        self.train_labels = torch.as_tensor(train_labels) if train_labels is not None else None
+        self.class_weights = None
+        if self.train_labels is not None:
+            counts = torch.bincount(self.train_labels, minlength=self.model.config.num_labels).float()
+            # n / (k * count_c): 1.0 for every class when the data is already balanced
+            self.class_weights = len(self.train_labels) / (len(counts) * counts.clamp(min=1))
+            logger.info(f"Class counts {counts.tolist()}, balancing with '{balancing}', weights {self.class_weights.tolist()}")
+
+    def _get_train_sampler(self, *args, **kwargs):
+        if self.balancing != "weighted_sampler":
+            return super()._get_train_sampler(*args, **kwargs)
+        generator = torch.Generator().manual_seed(self.args.seed)
+        return WeightedRandomSampler(self.class_weights[self.train_labels], num_samples=len(self.train_labels),
+                                     replacement=True, generator=generator)
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        if self.balancing != "class_weighted_loss":
+            return super().compute_loss(model, inputs, return_outputs=return_outputs, **kwargs)
+        labels = inputs.pop("labels")
+        outputs = model(**inputs)
+        loss = torch.nn.functional.cross_entropy(outputs.logits, labels, weight=self.class_weights.to(outputs.logits.device))
+        return (loss, outputs) if return_outputs else loss
+
 
 class ModelTraining:
     def __init__(self, config: TrainingConfig):
@@ -16,9 +68,13 @@ class ModelTraining:
         device = "cuda" if torch.cuda.is_available() else "cpu"
         logger.info(f"Using device: {device}")
 
-        # --- Load datasets (no change) ---
-        train_data = load_from_disk(str(self.config.train_dataset_path))
-        val_data = load_from_disk(str(self.config.val_dataset_path))
+        # --- Load datasets (lazy datasets are transformed on the fly, with augmentation for training) ---
+        train_data = load_transformed_dataset(self.config.train_dataset_path, augment=True)
+        val_data = load_transformed_dataset(self.config.val_dataset_path)
+        if 0 < self.config.eval_subsample < len(val_data):
+            # Frequent in-training evals only need a fixed, representative sample; the test set stays the real yardstick
+            val_data = val_data.shuffle(seed=self.config.random_state).select(range(self.config.eval_subsample))
+            logger.info(f"Evaluating during training on {len(val_data)} sampled validation images.")
         
         id2label = {i: label for i, label in enumerate(train_data.features['label'].names)}
         label2id = {label: i for i, label in id2label.items()}
@@ -31,20 +87,44 @@ class ModelTraining:
         # --- NEW: Move the model to the correct device ---
         model.to(device)
 
-        # --- TrainingArguments (no change) ---
+        if self.config.training_mode not in TRAINING_MODES:
+            raise ValueError(f"Unknown TRAINING_MODE '{self.config.training_mode}'. Expected one of {TRAINING_MODES}.")
+        if self.config.training_mode == "head_only":
+            self.train_head(model, device)
+            return
+
+        # Evaluate (and checkpoint, so the best model can be restored) every EVAL_STEPS steps, or per epoch
+        strategy = "steps" if self.config.eval_steps > 0 else "epoch"
+
+        # --- TrainingArguments (hyperparameters and performance knobs from params.yaml) ---
         args = TrainingArguments(
             output_dir=str(self.config.root_dir),
             learning_rate=self.config.learning_rate,
             per_device_train_batch_size=self.config.batch_size,
             per_device_eval_batch_size=self.config.batch_size,
             num_train_epochs=self.config.epochs,
+            # Step budget; overrides num_train_epochs when set
+            max_steps=self.config.max_steps,
             weight_decay=self.config.weight_decay,
             warmup_steps=self.config.warmup_steps,
-            save_strategy='epoch',
-            eval_strategy='epoch',
+            save_strategy=strategy,
+            eval_strategy=strategy,
+            save_steps=self.config.eval_steps if strategy == "steps" else 500,
+            eval_steps=self.config.eval_steps if strategy == "steps" else None,
             load_best_model_at_end=True,
-            metric_for_best_model="accuracy",
+            metric_for_best_model=self.config.early_stopping_metric,
             save_total_limit=1,
+            # Lazy datasets need the raw 'image' column to reach their transform
+            remove_unused_columns=False,
+            # Decoding and per-epoch augmentation run in worker processes, kept alive across epochs
+            dataloader_num_workers=self.config.dataloader_num_workers,
+            dataloader_persistent_workers=self.config.dataloader_num_workers > 0,
+            dataloader_pin_memory=self.config.dataloader_pin_memory and device == "cuda",
+            # Memory/speed trade-offs, all off by default
+            bf16=self.config.bf16,
+            gradient_accumulation_steps=self.config.gradient_accumulation_steps,
+            gradient_checkpointing=self.config.gradient_checkpointing,
+            torch_compile=self.config.torch_compile,
             report_to="none"
         )
         
@@ -53,12 +133,16 @@ class ModelTraining:
         def compute_metrics(eval_pred):
             predictions, labels = eval_pred
             predictions = predictions.argmax(axis=1)
-            return metric.compute(predictions=predictions, references=labels)
+            return {**metric.compute(predictions=predictions, references=labels),
+                    "f1": f1_score(labels, predictions, average='macro')}
         
         data_collator = DefaultDataCollator()
         processor = ViTImageProcessor.from_pretrained(self.config.model_name)
 
-        trainer = Trainer(
+        # Labels straight from Arrow, without running the (lazy) image transform
+        train_labels = load_from_disk(str(self.config.train_dataset_path))["label"]
+
+        trainer = BalancedTrainer(
             model, # The model is now already on the GPU
             args,
             train_dataset=train_data,
@@ -66,9 +150,139 @@ class ModelTraining:
             data_collator=data_collator,
             compute_metrics=compute_metrics,
             tokenizer=processor,
+            balancing=self.config.balancing,
+            train_labels=train_labels,
+            callbacks=[ThroughputCallback()],
         )
+        early_stopping = time_budget = None
+        if self.config.early_stopping_patience > 0:
+            early_stopping = RecordingEarlyStoppingCallback(early_stopping_patience=self.config.early_stopping_patience,
+                                                            early_stopping_threshold=self.config.early_stopping_threshold)
+            trainer.add_callback(early_stopping)
+        if self.config.max_train_minutes > 0:
+            time_budget = TimeBudgetCallback(self.config.max_train_minutes * 60)
+            trainer.add_callback(time_budget)
 
-        logger.info("Starting model fine-tuning with validation...")
-        trainer.train()
+        logger.info(f"Starting model fine-tuning with validation (bf16={self.config.bf16}, effective batch size "
+                    f"{self.config.batch_size * self.config.gradient_accumulation_steps}, "
+                    f"gradient checkpointing={self.config.gradient_checkpointing}, torch.compile={self.config.torch_compile})...")
+        train_output = trainer.train()
         trainer.save_model(str(self.config.trained_model_path))
-        logger.info("Model fine-tuning complete and best model saved.")
\ No newline at end of file
+        logger.info("Model fine-tuning complete and best model saved.")
+
+        self.save_summary({
+            "training_mode": "full",
+            "stop_reason": stop_reason(trainer.state, early_stopping, time_budget, self.config.max_steps),
+            "global_step": trainer.state.global_step,
+            "epoch": trainer.state.epoch,
+            "train_runtime_seconds": train_output.metrics.get("train_runtime"),
+            "metric": self.config.early_stopping_metric,
+            "best_metric": trainer.state.best_metric,
+            "best_model_checkpoint": trainer.state.best_model_checkpoint,
+        })
+
+    def save_summary(self, summary: dict):
+        """Where and why training stopped, saved as a DVC metric next to the model."""
+        path = self.config.training_summary_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=4)
+        logger.info(f"Training stopped ({summary['stop_reason']}) at step {summary['global_step']}; summary saved to {path}")
+
+    def train_head(self, model: ViTForImageClassification, device: str):
+        """
+        Linear probe: keeps the pretrained backbone frozen, trains only `model.classifier` on cached
+        [CLS] embeddings and saves the full model. After the first run (which fills the cache),
+        retraining takes seconds, so thresholds, class weights and hyperparameters can be iterated on cheaply.
+        """
+        if self.config.head_epochs < 1:
+            raise ValueError(f"HEAD_EPOCHS must be at least 1 in head_only mode, got {self.config.head_epochs}.")
+        cache = EmbeddingCache(self.config.embedding_cache_dir, self.config.model_name,
+                               batch_size=self.config.batch_size, num_workers=self.config.dataloader_num_workers)
+        train_x, train_y = cache.get("train", self.config.train_dataset_path, model)
+        val_x, val_y = cache.get("val", self.config.val_dataset_path, model)
+        train_x, train_y = torch.from_numpy(np.ascontiguousarray(train_x)), torch.from_numpy(train_y)
+        val_x, val_y = torch.from_numpy(np.ascontiguousarray(val_x)).to(device), torch.from_numpy(val_y).to(device)
+
+        # Same balancing semantics as BalancedTrainer
+        counts = torch.bincount(train_y, minlength=model.config.num_labels).float()
+        class_weights = len(train_y) / (len(counts) * counts.clamp(min=1))
+        # Seeded like BalancedTrainer's sampler, so head runs are reproducible
+        generator = torch.Generator().manual_seed(self.config.random_state)
+        sampler = None
+        if self.config.balancing == "weighted_sampler":
+            sampler = WeightedRandomSampler(class_weights[train_y], num_samples=len(train_y), replacement=True,
+                                            generator=generator)
+        loss_weights = class_weights.to(device) if self.config.balancing == "class_weighted_loss" else None
+        loader = DataLoader(TensorDataset(train_x, train_y), batch_size=self.config.batch_size,
+                            shuffle=sampler is None, sampler=sampler, generator=generator)
+
+        # Honour the same stopping metric and validation sample as full fine-tuning
+        metric = self.config.early_stopping_metric
+        if metric not in HEAD_METRICS:
+            raise ValueError(f"EARLY_STOPPING_METRIC '{metric}' is not supported in head_only mode. Expected one of {HEAD_METRICS}.")
+        if 0 < self.config.eval_subsample < len(val_y):
+            # A fixed sample, seeded with RANDOM_STATE like full fine-tuning's val_data.shuffle
+            keep = torch.from_numpy(np.random.default_rng(self.config.random_state).permutation(len(val_y))[:self.config.eval_subsample]).to(device)
+            val_x, val_y = val_x[keep], val_y[keep]
+            logger.info(f"Evaluating the head on {len(val_y)} sampled validation embeddings.")
+        # Loss improves downwards, accuracy and f1 upwards
+        sign = -1.0 if metric == "loss" else 1.0
+
+        def evaluate_head() -> dict:
+            head.eval()
+            with torch.inference_mode():
+                logits = head(val_x)
+            predictions = logits.argmax(-1)
+            return {
+                "accuracy": (predictions == val_y).float().mean().item(),
+                "f1": f1_score(val_y.cpu().numpy(), predictions.cpu().numpy(), average='macro'),
+                "loss": torch.nn.functional.cross_entropy(logits, val_y, weight=loss_weights).item(),
+            }
+
+        head = model.classifier
+        optimizer = torch.optim.AdamW(head.parameters(), lr=self.config.head_learning_rate,
+                                      weight_decay=self.config.weight_decay)
+        best_metric, best_state, best_epoch = None, None, 0
+        reason, start = "completed", time.perf_counter()
+        logger.info(f"Training the classification head for {self.config.head_epochs} epochs on cached embeddings "
+                    f"(best head by val {metric})...")
+        for epoch in range(1, self.config.head_epochs + 1):
+            head.train()
+            for x, y in loader:
+                loss = torch.nn.functional.cross_entropy(head(x.to(device)), y.to(device), weight=loss_weights)
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+
+            scores = evaluate_head()
+            if best_metric is None or sign * (scores[metric] - best_metric) > self.config.early_stopping_threshold:
+                best_metric, best_state, best_epoch = scores[metric], copy.deepcopy(head.state_dict()), epoch
+            if epoch % 10 == 0 or epoch == self.config.head_epochs:
+                logger.info(f"Head epoch {epoch}: loss {loss.item():.4f}, val {scores} (best {metric} {best_metric:.4f})")
+
+            # Same stopping rules as full fine-tuning, counted in epochs
+            if 0 < self.config.early_stopping_patience <= epoch - best_epoch:
+                reason = "early_stopping"
+            elif 0 < self.config.max_train_minutes * 60 <= time.perf_counter() - start:
+                reason = "time_budget"
+            if reason != "completed":
+                logger.info(f"Stopping head training at epoch {epoch} ({reason}).")
+                break
+
+        # Keep the best head, like load_best_model_at_end in full fine-tuning; if no epoch beat the threshold, keep the last one
+        if best_state is not None:
+            head.load_state_dict(best_state)
+        model.save_pretrained(str(self.config.trained_model_path))
+        ViTImageProcessor.from_pretrained(self.config.model_name).save_pretrained(str(self.config.trained_model_path))
+        self.save_summary({
+            "training_mode": "head_only",
+            "stop_reason": reason,
+            "global_step": epoch * len(loader),
+            "epoch": epoch,
+            "train_runtime_seconds": time.perf_counter() - start,
+            "metric": metric,
+            "best_metric": best_metric,
+            "best_epoch": best_epoch,
+        })
+        logger.info(f"Head training complete (best val {metric} {best_metric:.4f}); full model saved.")
@@ -0,0 +1,81 @@
+# src/vitClassifier/components/training_callbacks.py
+
+import resource
+import sys
+import time
+import torch
+from transformers import EarlyStoppingCallback, TrainerCallback
+from vitClassifier import logger
+
+
+def peak_memory_mb() -> float:
+    """Peak CUDA memory allocated when training on GPU, else the peak RSS of this process so far."""
+    if torch.cuda.is_available():
+        return torch.cuda.max_memory_allocated() / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class ThroughputCallback(TrainerCallback):
+    """Logs training samples/sec and peak memory at the end of every epoch."""
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self._start_time = time.perf_counter()
+        self._start_step = state.global_step
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        elapsed = time.perf_counter() - self._start_time
+        samples = (state.global_step - self._start_step) * args.train_batch_size * args.gradient_accumulation_steps * args.world_size
+        metrics = {"samples_per_second": samples / elapsed if elapsed else 0.0, "peak_memory_mb": peak_memory_mb()}
+        state.log_history.append({"epoch": state.epoch, "step": state.global_step, **metrics})
+        logger.info(f"Epoch {state.epoch:.2f}: {metrics['samples_per_second']:.1f} samples/s, "
+                    f"peak memory {metrics['peak_memory_mb']:.0f} MB")
+
+
+class TimeBudgetCallback(TrainerCallback):
+    """Stops training (after the current step, saving as usual) once `max_seconds` of wall-clock time have passed."""
+
+    def __init__(self, max_seconds: float):
+        self.max_seconds = max_seconds
+        self.triggered = False
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self._start_time = time.perf_counter()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if time.perf_counter() - self._start_time >= self.max_seconds:
+            self.triggered = True
+            control.should_training_stop = True
+            # Evaluate and save now so load_best_model_at_end can still see this last stretch
+            control.should_evaluate = control.should_save = True
+            logger.info(f"Time budget of {self.max_seconds / 60:.1f} min reached at step {state.global_step}, stopping.")
+
+
+class RecordingEarlyStoppingCallback(EarlyStoppingCallback):
+    """`EarlyStoppingCallback` that remembers whether it was the one to stop training."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.triggered = False
+
+    def on_evaluate(self, args, state, control, metrics, **kwargs):
+        super().on_evaluate(args, state, control, metrics, **kwargs)
+        if self.early_stopping_patience_counter >= self.early_stopping_patience:
+            self.triggered = True
+            logger.info(f"No improvement in {args.metric_for_best_model} for {self.early_stopping_patience} "
+                        f"evaluations, stopping early at step {state.global_step}.")
+
+
+def stop_reason(state, early_stopping: RecordingEarlyStoppingCallback = None, time_budget: TimeBudgetCallback = None,
+                max_steps: int = -1) -> str:
+    """Why a finished run stopped: 'early_stopping', 'time_budget', 'step_budget' or 'completed'."""
+    if early_stopping is not None and early_stopping.triggered:
+        return "early_stopping"
+    if time_budget is not None and time_budget.triggered:
+        return "time_budget"
+    if max_steps > 0 and state.global_step >= max_steps:
+        return "step_budget"
+    return "completed"
@@ -5,7 +5,8 @@ from vitClassifier.utils.common import read_yaml, create_directories
 from vitClassifier.entity.config_entity import (DataIngestionConfig,
                                                   DataTransformationConfig,
                                                   TrainingConfig,
-                                                  EvaluationConfig)
+                                                  EvaluationConfig,
+                                                  ExportConfig)
 from pathlib import Path
 import os
 
@@ -31,7 +32,9 @@ class ConfigurationManager:
             unzip_dir=Path(config.unzip_dir),
             train_df_path=Path(config.train_df_path),
             test_df_path=Path(config.test_df_path),
-            val_df_path=Path(config.val_df_path)
+            val_df_path=Path(config.val_df_path),
+            manifest_path=Path(config.manifest_path),
+            num_workers=self.params.INGESTION_NUM_WORKERS
         )
 
     def get_data_transformation_config(self) -> DataTransformationConfig:
@@ -44,7 +47,10 @@ class ConfigurationManager:
             val_data_path=Path(config.val_data_path),
             train_dataset_path=Path(config.train_dataset_path),
             test_dataset_path=Path(config.test_dataset_path),
-            val_dataset_path=Path(config.val_dataset_path)
+            val_dataset_path=Path(config.val_dataset_path),
+            transform_mode=self.params.TRANSFORM_MODE,
+            num_proc=self.params.NUM_PROC,
+            balancing=self.params.BALANCING
         )
     
     def get_training_config(self) -> TrainingConfig:
@@ -62,6 +68,26 @@ class ConfigurationManager:
             epochs=params.EPOCHS,
             weight_decay=params.WEIGHT_DECAY,
             warmup_steps=params.WARMUP_STEPS,
+            dataloader_num_workers=params.DATALOADER_NUM_WORKERS,
+            balancing=params.BALANCING,
+            bf16=params.BF16,
+            gradient_accumulation_steps=params.GRADIENT_ACCUMULATION_STEPS,
+            gradient_checkpointing=params.GRADIENT_CHECKPOINTING,
+            torch_compile=params.TORCH_COMPILE,
+            dataloader_pin_memory=params.DATALOADER_PIN_MEMORY,
+            training_mode=params.TRAINING_MODE,
+            embedding_cache_dir=Path(training.embedding_cache_dir),
+            head_epochs=params.HEAD_EPOCHS,
+            head_learning_rate=params.HEAD_LEARNING_RATE,
+            random_state=params.RANDOM_STATE,
+            training_summary_path=Path(training.training_summary_path),
+            early_stopping_metric=params.EARLY_STOPPING_METRIC,
+            early_stopping_patience=params.EARLY_STOPPING_PATIENCE,
+            early_stopping_threshold=params.EARLY_STOPPING_THRESHOLD,
+            max_train_minutes=params.MAX_TRAIN_MINUTES,
+            max_steps=params.MAX_STEPS,
+            eval_steps=params.EVAL_STEPS,
+            eval_subsample=params.EVAL_SUBSAMPLE,
         )
 
     def get_evaluation_config(self) -> EvaluationConfig:
@@ -72,5 +98,24 @@ class ConfigurationManager:
             mlflow_uri=eval_config.mlflow_uri,
             all_params=self.params,
             batch_size=self.params.BATCH_SIZE,
-            metrics_file_name=Path(eval_config.metrics_file_name) # <--- MAKE SURE THIS LINE EXISTS
+            metrics_file_name=Path(eval_config.metrics_file_name), # <--- MAKE SURE THIS LINE EXISTS
+            quantized_model_path=Path(eval_config.quantized_model_path),
+            onnx_model_path=Path(eval_config.onnx_model_path),
+            backends=list(self.params.EVAL_BACKENDS),
+            num_workers=self.params.DATALOADER_NUM_WORKERS
+        )
+
+    def get_export_config(self) -> ExportConfig:
+        config = self.config.model_export
+        create_directories([config.root_dir])
+        return ExportConfig(
+            root_dir=Path(config.root_dir),
+            model_path=Path(config.model_path),
+            test_dataset_path=Path(config.test_dataset_path),
+            quantized_model_path=Path(config.quantized_model_path),
+            onnx_model_path=Path(config.onnx_model_path),
+            parity_report_path=Path(config.parity_report_path),
+            onnx_opset=self.params.ONNX_OPSET,
+            batch_size=self.params.BATCH_SIZE,
+            max_accuracy_drop=self.params.EXPORT_MAX_ACCURACY_DROP
         )
\ No newline at end of file
@@ -9,6 +9,8 @@ class DataIngestionConfig:
     train_df_path: Path # New
     test_df_path: Path  # New
     val_df_path: Path   # New
+    manifest_path: Path
+    num_workers: int
 
 @dataclass(frozen=True)
 class DataTransformationConfig:
@@ -19,6 +21,9 @@ class DataTransformationConfig:
     train_dataset_path: Path
     test_dataset_path: Path
     val_dataset_path: Path # New
+    transform_mode: str
+    num_proc: int
+    balancing: str
 
 @dataclass(frozen=True)
 class TrainingConfig:
@@ -32,6 +37,26 @@ class TrainingConfig:
     epochs: int
     weight_decay: float
     warmup_steps: int
+    dataloader_num_workers: int
+    balancing: str
+    bf16: bool
+    gradient_accumulation_steps: int
+    gradient_checkpointing: bool
+    torch_compile: bool
+    dataloader_pin_memory: bool
+    training_mode: str
+    embedding_cache_dir: Path
+    head_epochs: int
+    head_learning_rate: float
+    random_state: int
+    training_summary_path: Path
+    early_stopping_metric: str
+    early_stopping_patience: int
+    early_stopping_threshold: float
+    max_train_minutes: float
+    max_steps: int
+    eval_steps: int
+    eval_subsample: int
 
 @dataclass(frozen=True)
 class EvaluationConfig:
@@ -40,4 +65,20 @@ class EvaluationConfig:
     mlflow_uri: str
     all_params: dict
     batch_size: int
-    metrics_file_name: Path
\ No newline at end of file
+    metrics_file_name: Path
+    quantized_model_path: Path
+    onnx_model_path: Path
+    backends: list
+    num_workers: int
+
+@dataclass(frozen=True)
+class ExportConfig:
+    root_dir: Path
+    model_path: Path
+    test_dataset_path: Path
+    quantized_model_path: Path
+    onnx_model_path: Path
+    parity_report_path: Path
+    onnx_opset: int
+    batch_size: int
+    max_accuracy_drop: float
\ No newline at end of file
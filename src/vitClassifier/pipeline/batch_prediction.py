@@ -0,0 +1,184 @@
+# batch_prediction.py
+
+import argparse
+import glob
+import time
+import numpy as np
+import pandas as pd
+import torch
+from pathlib import Path
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+from typing import List, Set
+from vitClassifier.components.inference_backend import BACKENDS
+from vitClassifier.pipeline.prediction import PredictionPipeline
+from vitClassifier.utils.preprocessing import FastImagePreprocessor
+from vitClassifier import logger
+
+IMAGE_EXTENSIONS = {".jpeg", ".jpg", ".png", ".bmp", ".tif", ".tiff"}
+RESULT_COLUMNS = ["image", "predicted_label", "confidence_score", "error"]
+
+
+def collect_image_paths(source: str, column: str = "image") -> List[str]:
+    """
+    Resolves the input to a list of image paths. Accepts a directory (searched recursively),
+    a CSV manifest with an `image` column (e.g. the dataframes written by DataIngestion) or a glob pattern.
+    """
+    path = Path(source)
+    if path.is_dir():
+        return sorted(str(p) for p in path.rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if path.suffix.lower() == ".csv":
+        return pd.read_csv(path, usecols=[column])[column].astype(str).tolist()
+    paths = sorted(glob.glob(source, recursive=True))
+    if not paths:
+        raise FileNotFoundError(f"No images found for '{source}'. Expected a directory, a CSV manifest or a glob pattern.")
+    return paths
+
+
+class ImagePathDataset(Dataset):
+    """Decodes and resizes images in DataLoader workers; normalization is left to the main process, once per batch."""
+
+    def __init__(self, paths: List[str], preprocessor: FastImagePreprocessor):
+        self.paths = paths
+        self.preprocessor = preprocessor
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index: int):
+        try:
+            with Image.open(self.paths[index]) as image:
+                raw = self.preprocessor.resize(image)
+            error = ""
+        except Exception as e:
+            # A corrupt file must not take the whole run down; it is reported in the output instead
+            raw = np.zeros((self.preprocessor.size, self.preprocessor.size, 3), dtype=np.uint8)
+            error = f"{type(e).__name__}: {e}"
+        return self.paths[index], torch.from_numpy(raw), error
+
+
+class ResultWriter:
+    """
+    Appends results as they are produced, so an interrupted run loses at most the rows not yet flushed.
+    CSV output is a single file; Parquet output is a directory of part files (readable with `pd.read_parquet`).
+    """
+
+    def __init__(self, output_path: str, flush_every: int = 4096):
+        self.output_path = Path(output_path)
+        self.format = "parquet" if self.output_path.suffix.lower() == ".parquet" else "csv"
+        self.flush_every = flush_every
+        self._rows: List[dict] = []
+
+    def _part_files(self) -> List[Path]:
+        return sorted(self.output_path.glob("part-*.parquet")) if self.output_path.is_dir() else []
+
+    def done_paths(self) -> Set[str]:
+        """Images already present in the output from a previous (possibly interrupted) run."""
+        if self.format == "csv":
+            if not self.output_path.exists() or self.output_path.stat().st_size == 0:
+                return set()
+            return set(pd.read_csv(self.output_path, usecols=["image"])["image"].astype(str))
+        return {image for part in self._part_files() for image in pd.read_parquet(part, columns=["image"])["image"]}
+
+    def clear(self):
+        """Removes the results of a previous run."""
+        if self.format == "csv":
+            self.output_path.unlink(missing_ok=True)
+        for part in self._part_files():
+            part.unlink()
+
+    def write(self, rows: List[dict]):
+        self._rows.extend(rows)
+        if self.format == "csv" or len(self._rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        df = pd.DataFrame(self._rows, columns=RESULT_COLUMNS)
+        if self.format == "csv":
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            write_header = not self.output_path.exists() or self.output_path.stat().st_size == 0
+            df.to_csv(self.output_path, mode="a", header=write_header, index=False)
+        else:
+            self.output_path.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(self.output_path / f"part-{len(self._part_files()):05d}.parquet", index=False)
+        self._rows = []
+
+
+class BatchPredictionPipeline:
+    def __init__(self, pipeline: PredictionPipeline, batch_size: int = 64, num_workers: int = 4):
+        """
+        Scores many images with one loaded model.
+
+        Args:
+            pipeline (PredictionPipeline): Loaded model, backend and preprocessor.
+            batch_size (int): Images per forward pass.
+            num_workers (int): DataLoader processes decoding and resizing images in parallel.
+        """
+        self.pipeline = pipeline
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+
+    def run(self, source: str, output_path: str, resume: bool = True, column: str = "image") -> int:
+        """Scores every image in `source` not yet in `output_path` and returns the number scored."""
+        writer = ResultWriter(output_path)
+        paths = collect_image_paths(source, column)
+        if resume:
+            done = writer.done_paths()
+            if done:
+                logger.info(f"Resuming: {len(done)} images already scored in {output_path}")
+            paths = [p for p in paths if p not in done]
+        else:
+            writer.clear()
+        logger.info(f"Scoring {len(paths)} images with backend '{self.pipeline.model.name}'")
+        if not paths:
+            return 0
+
+        loader = DataLoader(
+            ImagePathDataset(paths, self.pipeline.fast_preprocessor),
+            batch_size=self.batch_size, num_workers=self.num_workers,
+            pin_memory=self.pipeline.device == "cuda",
+            persistent_workers=False, prefetch_factor=4 if self.num_workers > 0 else None,
+        )
+
+        scored, start = 0, time.perf_counter()
+        try:
+            for step, (batch_paths, raw, errors) in enumerate(loader, start=1):
+                pixel_values = self.pipeline.fast_preprocessor.normalize(raw)
+                predictions = self.pipeline.predict_batch(pixel_values)
+                writer.write([
+                    {"image": path, "predicted_label": label if not error else None,
+                     "confidence_score": round(confidence, 4) if not error else None, "error": error or None}
+                    for path, (label, confidence), error in zip(batch_paths, predictions, errors)
+                ])
+                scored += len(batch_paths)
+                if step % 50 == 0:
+                    logger.info(f"Scored {scored}/{len(paths)} images ({scored / (time.perf_counter() - start):.1f} images/s)")
+        finally:
+            writer.flush()
+
+        logger.info(f"Scored {scored} images in {time.perf_counter() - start:.1f}s, results in {output_path}")
+        return scored
+
+
+if __name__ == '__main__':
+    # --- How to run this script from the command line ---
+    # Example 1 (a folder of studies, CSV output):
+    # python -m vitClassifier.pipeline.batch_prediction --input "archive/" --output "scores.csv"
+
+    # Example 2 (a DataIngestion manifest, Parquet output, int8 on CPU):
+    # python -m vitClassifier.pipeline.batch_prediction --input "artifacts/data_ingestion/test_df.csv" --output "scores.parquet" --backend int8
+
+    parser = argparse.ArgumentParser(description="Chest X-ray Pneumonia Detection - bulk scoring")
+    parser.add_argument("--input", type=str, required=True, help="Directory, glob pattern or CSV manifest with an 'image' column")
+    parser.add_argument("--output", type=str, required=True, help="Results file: .csv, or .parquet (written as a directory of parts)")
+    parser.add_argument("--backend", type=str, default="fp32", choices=BACKENDS, help="Inference backend to serve the model with")
+    parser.add_argument("--batch-size", type=int, default=64, help="Images per forward pass")
+    parser.add_argument("--num-workers", type=int, default=4, help="DataLoader processes decoding images")
+    parser.add_argument("--column", type=str, default="image", help="Image path column of a CSV manifest")
+    parser.add_argument("--no-resume", action="store_true", help="Rescore images already present in the output")
+    args = parser.parse_args()
+
+    batch_pipeline = BatchPredictionPipeline(PredictionPipeline(backend=args.backend), args.batch_size, args.num_workers)
+    batch_pipeline.run(args.input, args.output, resume=not args.no_resume, column=args.column)
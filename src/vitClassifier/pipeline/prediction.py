@@ -1,28 +1,35 @@
 # prediction.py
 
 import torch
-from transformers import ViTImageProcessor, ViTForImageClassification
+from transformers import ViTImageProcessor
 from PIL import Image
 import argparse
 import os
 from pathlib import Path
+from vitClassifier.components.inference_backend import BACKENDS, load_backend
+from vitClassifier.utils.preprocessing import FastImagePreprocessor
 
 class PredictionPipeline:
-    def __init__(self, model_path: str = "artifacts/model_training/model"):
+    def __init__(self, model_path: str = "artifacts/model_training/model", backend: str = "fp32",
+                 quantized_model_path: str = "artifacts/model_export/model_int8.pt",
+                 onnx_model_path: str = "artifacts/model_export/model.onnx"):
         """
         Initializes the prediction pipeline by loading the trained model and processor.
         
         Args:
             model_path (str): The path to the directory containing the saved model and processor.
+            backend (str): 'fp32' (PyTorch), 'int8' (dynamic-quantized PyTorch) or 'onnx' (ONNX Runtime).
+            quantized_model_path (str): Int8 weights written by the model export stage.
+            onnx_model_path (str): ONNX graph written by the model export stage.
         """
-        # Set the device
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"Using device: {self.device}")
+        # Set the device (the int8 and onnx backends always run on CPU)
+        self.device = "cuda" if torch.cuda.is_available() and backend == "fp32" else "cpu"
+        print(f"Using device: {self.device}, backend: {backend}")
         
         # Load the processor and model from the specified path
         self.processor = ViTImageProcessor.from_pretrained(model_path)
-        self.model = ViTForImageClassification.from_pretrained(model_path).to(self.device)
-        self.model.eval() # Set the model to evaluation mode
+        self.fast_preprocessor = FastImagePreprocessor.from_processor(self.processor)
+        self.model = load_backend(backend, Path(model_path), Path(quantized_model_path), Path(onnx_model_path), device=self.device)
         
         # Get the label mappings from the model's configuration
         self.id2label = self.model.config.id2label
@@ -45,24 +52,14 @@ class PredictionPipeline:
         except Exception as e:
             return {"error": f"Failed to open image: {e}"}
 
-        # Preprocess the image using the ViTImageProcessor
+        # Preprocess the image with the processor's size/mean/std
         # This handles resizing, normalization, and conversion to a tensor
-        inputs = self.processor(images=image, return_tensors="pt").to(self.device)
+        pixel_values = self.fast_preprocessor([image])
         
-        # Make a prediction
-        with torch.no_grad(): # Disable gradient calculation for faster inference
-            outputs = self.model(**inputs)
-            logits = outputs.logits
+        # Make a prediction (the backend disables gradient calculation for faster inference)
+        logits = self.model(pixel_values)
 
-        # Get the predicted class index
-        predicted_class_idx = logits.argmax(-1).item()
-        
-        # Get the human-readable label
-        predicted_label = self.id2label[predicted_class_idx]
-        
-        # Calculate the confidence score using softmax
-        probabilities = torch.nn.functional.softmax(logits, dim=-1)
-        confidence_score = probabilities[0][predicted_class_idx].item()
+        predicted_label, confidence_score = self.labels_from_logits(logits)[0]
         
         result = {
             "predicted_label": predicted_label,
@@ -71,6 +68,32 @@ class PredictionPipeline:
         
         return result
 
+    def labels_from_logits(self, logits: torch.Tensor):
+        """
+        Converts a batch of logits into (label, confidence) pairs.
+        
+        Args:
+            logits (torch.Tensor): Classifier output of shape (batch, num_labels).
+            
+        Returns:
+            list: One (predicted_label, confidence_score) tuple per row.
+        """
+        # Softmax gives the confidence of the predicted (argmax) class
+        confidences, indices = torch.nn.functional.softmax(logits, dim=-1).max(dim=-1)
+        return [(self.id2label[idx], conf) for idx, conf in zip(indices.tolist(), confidences.tolist())]
+
+    def predict_batch(self, pixel_values: torch.Tensor):
+        """
+        Makes predictions on an already preprocessed batch in a single forward pass.
+        
+        Args:
+            pixel_values (torch.Tensor): Normalized images of shape (batch, 3, size, size).
+            
+        Returns:
+            list: One (predicted_label, confidence_score) tuple per image.
+        """
+        return self.labels_from_logits(self.model(pixel_values))
+
 if __name__ == '__main__':
     # --- How to run this script from the command line ---
     # Example 1 (Pneumonia):
@@ -82,10 +105,11 @@ if __name__ == '__main__':
     # Set up argument parser to accept image path from the command line
     parser = argparse.ArgumentParser(description="Chest X-ray Pneumonia Detection")
     parser.add_argument("--image", type=str, required=True, help="Path to the input image")
+    parser.add_argument("--backend", type=str, default="fp32", choices=BACKENDS, help="Inference backend to serve the model with")
     args = parser.parse_args()
 
     # Create an instance of the pipeline
-    pipeline = PredictionPipeline()
+    pipeline = PredictionPipeline(backend=args.backend)
     
     # Make a prediction
     result = pipeline.predict(args.image)
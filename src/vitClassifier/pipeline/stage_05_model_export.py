@@ -0,0 +1,24 @@
+from vitClassifier.config.configuration import ConfigurationManager
+from vitClassifier.components.model_export import ModelExport
+from vitClassifier import logger
+
+STAGE_NAME = "Model Export stage"
+
+class ModelExportPipeline:
+    def __init__(self):
+        pass
+    def main(self):
+        config = ConfigurationManager()
+        export_config = config.get_export_config()
+        model_export = ModelExport(config=export_config)
+        model_export.export()
+
+if __name__ == '__main__':
+    try:
+        logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
+        obj = ModelExportPipeline()
+        obj.main()
+        logger.info(f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
+    except Exception as e:
+        logger.exception(e)
+        raise e
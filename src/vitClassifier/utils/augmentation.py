@@ -0,0 +1,30 @@
+# src/vitClassifier/utils/augmentation.py
+
+from torch.utils.data import Dataset
+from torchvision.transforms import Compose, RandomHorizontalFlip, RandomRotation
+from typing import Sequence
+
+
+class TensorAugmentedDataset(Dataset):
+    """
+    Applies the training augmentation (random rotation up to 15 degrees and horizontal flip) to
+    already normalized `pixel_values` each time a row is read, so precomputed datasets also get
+    fresh augmentations every epoch. Corners exposed by the rotation are filled with normalized
+    black, matching what rotating the PIL image before normalization would give.
+    """
+
+    def __init__(self, dataset, image_mean: Sequence[float], image_std: Sequence[float]):
+        self.dataset = dataset
+        black = [(0.0 - mean) / std for mean, std in zip(image_mean, image_std)]
+        self.augment = Compose([RandomRotation(15, fill=black), RandomHorizontalFlip()])
+
+    @property
+    def features(self):
+        return self.dataset.features
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index: int):
+        row = self.dataset[index]
+        return {"pixel_values": self.augment(row["pixel_values"]), "label": row["label"]}
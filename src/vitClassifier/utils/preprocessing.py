@@ -0,0 +1,71 @@
+# src/vitClassifier/utils/preprocessing.py
+
+import threading
+import numpy as np
+import torch
+from PIL import Image
+from typing import List, Sequence, Union
+
+
+class FastImagePreprocessor:
+    """
+    Drop-in replacement for `ViTImageProcessor(images=..., return_tensors="pt")` at
+    inference time. Each decoded image is resized once with PIL (same bilinear filter as the
+    HF processor), copied into a reusable uint8 batch buffer, and the whole batch is then
+    rescaled and normalized in a single tensor op with precomputed scale/shift.
+
+    Buffers are per thread; the returned tensor is only valid until the same thread's next call.
+    """
+
+    def __init__(self, size: int = 224, image_mean: Sequence[float] = (0.5, 0.5, 0.5),
+                 image_std: Sequence[float] = (0.5, 0.5, 0.5), resample: int = Image.BILINEAR):
+        self.size = size
+        self.resample = resample
+        mean = torch.tensor(image_mean, dtype=torch.float32).view(1, 3, 1, 1)
+        std = torch.tensor(image_std, dtype=torch.float32).view(1, 3, 1, 1)
+        # (x / 255 - mean) / std == x * scale - shift
+        self._scale = 1.0 / (255.0 * std)
+        self._shift = mean / std
+        self._local = threading.local()
+
+    @classmethod
+    def from_processor(cls, processor) -> "FastImagePreprocessor":
+        """Copies size, mean, std and resample filter from a loaded `ViTImageProcessor`."""
+        return cls(size=processor.size["height"], image_mean=processor.image_mean,
+                   image_std=processor.image_std, resample=processor.resample)
+
+    def _buffers(self, batch_size: int):
+        local = self._local
+        if getattr(local, "capacity", 0) < batch_size:
+            local.raw = torch.empty((batch_size, self.size, self.size, 3), dtype=torch.uint8)
+            local.out = torch.empty((batch_size, 3, self.size, self.size), dtype=torch.float32)
+            local.capacity = batch_size
+        return local.raw[:batch_size], local.out[:batch_size]
+
+    def __getstate__(self):
+        # Thread-local buffers cannot be pickled (e.g. when sent to DataLoader workers); they are recreated lazily
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def resize(self, image: Union[Image.Image, np.ndarray]) -> np.ndarray:
+        """Decoded image -> uint8 HWC array at the model's input size (the per-image, parallelizable half)."""
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        return np.asarray(image.convert("RGB").resize((self.size, self.size), self.resample))
+
+    def normalize(self, raw: torch.Tensor, out: torch.Tensor = None) -> torch.Tensor:
+        """uint8 NHWC batch -> normalized float32 NCHW, written into `out` when given."""
+        out = torch.mul(raw.permute(0, 3, 1, 2), self._scale, out=out)
+        return out.sub_(self._shift)
+
+    def __call__(self, images: List[Union[Image.Image, np.ndarray]]) -> torch.Tensor:
+        raw, out = self._buffers(len(images))
+        for i, image in enumerate(images):
+            raw[i].copy_(torch.from_numpy(self.resize(image)))
+        # Written straight into the preallocated output
+        return self.normalize(raw, out=out)